@@ -1,43 +1,109 @@
-from flask import Blueprint, render_template, request, jsonify, flash, redirect, url_for
+from flask import Blueprint, render_template, request, jsonify, flash, redirect, url_for, Response, current_app
 from flask_login import login_required, current_user
-from models import db, Projects, Skills, Bio, SocialLinks, ContactSubmission, Certifications, ToolsTechnologies, Education, LetsTalk
+from models import db, Projects, Skills, Bio, SocialLinks, ContactSubmission, Certifications, ToolsTechnologies, Education, LetsTalk, excerpt
+from sqlalchemy import select, func
+from sqlalchemy.orm import load_only, with_expression
+from events import broker, format_sse
+from retention import search_archive
+from uploads import save_image_upload, set_image
+from pagination import paginate, edit_item
+from tenancy import current_tenant_id
+from analytics import project_summary
 import os
-from werkzeug.utils import secure_filename
+import queue
+import time
 from datetime import datetime  # Make sure this is imported for date handling
 
 admin = Blueprint('admin', __name__)
 
-def allowed_file(filename):
-    ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'svg'}
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+# Column projections for list pages: only what the list templates render.
+# Edit forms and detail endpoints load the full row.
+PROJECT_LIST_COLUMNS = load_only(Projects.id, Projects.title, Projects.tech_stack, Projects.image_url,
+                                 Projects.featured, Projects.created_at)
+CERTIFICATION_LIST_COLUMNS = load_only(Certifications.id, Certifications.title, Certifications.issuing_organization,
+                                       Certifications.issue_date, Certifications.expiry_date,
+                                       Certifications.credential_id, Certifications.image_url)
+EDUCATION_LIST_COLUMNS = load_only(Education.id, Education.degree, Education.institution, Education.location,
+                                   Education.start_date, Education.end_date, Education.current, Education.grade)
+MESSAGE_LIST_COLUMNS = load_only(ContactSubmission.id, ContactSubmission.name, ContactSubmission.email,
+                                 ContactSubmission.subject, ContactSubmission.created_at, ContactSubmission.read)
+# Columns each list can be sorted by (all indexed; see models.py)
+PROJECT_SORTS = {'created': Projects.created_at, 'title': Projects.title}
+SKILL_SORTS = {'order': Skills.display_order, 'name': Skills.skill_name, 'proficiency': Skills.proficiency_level}
+CERTIFICATION_SORTS = {'issued': Certifications.issue_date, 'title': Certifications.title}
+TOOL_SORTS = {'order': ToolsTechnologies.display_order, 'name': ToolsTechnologies.name}
+EDUCATION_SORTS = {'start': Education.start_date, 'degree': Education.degree}
+LETS_TALK_SORTS = {'order': LetsTalk.display_order, 'title': LetsTalk.title}
+MESSAGE_SORTS = {'received': ContactSubmission.created_at, 'name': ContactSubmission.name}
+# One character past what the templates show, so they can tell whether to add an ellipsis
+EDUCATION_EXCERPT = 101
+MESSAGE_EXCERPT = 301
+ANALYTICS_DAYS = 30
+
+# Dashboard counters; the async event stream in asgi.py runs the same queries
+DASHBOARD_COUNTS = {
+    'projects_count': select(func.count(Projects.id)),
+    'skills_count': select(func.count(Skills.id)),
+    'certifications_count': select(func.count(Certifications.id)),
+    'tools_count': select(func.count(ToolsTechnologies.id)),
+    'education_count': select(func.count(Education.id)),
+    'lets_talk_count': select(func.count(LetsTalk.id)),
+    'unread_messages': select(func.count(ContactSubmission.id)).where(ContactSubmission.read.is_(False)),
+    'total_messages': select(func.count(ContactSubmission.id)),
+}
+
+def dashboard_stats():
+    return {key: db.session.scalar(query) for key, query in DASHBOARD_COUNTS.items()}
 
 @admin.route('/admin/dashboard')
 @login_required
 def dashboard():
-    stats = {
-        'projects_count': Projects.query.count(),
-        'skills_count': Skills.query.count(),
-        'certifications_count': Certifications.query.count(),
-        'tools_count': ToolsTechnologies.query.count(),
-        'education_count': Education.query.count(),
-        'lets_talk_count': LetsTalk.query.count(),
-        'unread_messages': ContactSubmission.query.filter_by(read=False).count(),
-        'total_messages': ContactSubmission.query.count()
-    }
-    return render_template('admin/dashboard.html', stats=stats)
+    return render_template('admin/dashboard.html', stats=dashboard_stats(),
+                           analytics=project_summary(ANALYTICS_DAYS))
+
+@admin.route('/admin/events')
+@login_required
+def events():
+    """Server-sent events stream of new messages and dashboard counter changes"""
+    if not current_app.config['SSE_WSGI']:
+        # A stream would pin one of the worker's few threads; 204 tells EventSource not to reconnect
+        return '', 204
+    # Subscribe before taking the snapshot so no change falls between the two
+    subscription = broker.subscribe(current_tenant_id())
+    snapshot = dashboard_stats()
+    keepalive = current_app.config['SSE_KEEPALIVE']
+    max_age = current_app.config['SSE_MAX_AGE']
+
+    def stream():
+        # No database access in here: the request context (and its connection) is gone
+        deadline = time.monotonic() + max_age
+        try:
+            yield f'retry: 3000\n{format_sse("stats", snapshot)}'
+            while time.monotonic() < deadline and not subscription.overflowed:
+                try:
+                    name, data = subscription.get(timeout=keepalive)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+                    continue
+                yield format_sse(name, data)
+        finally:
+            broker.unsubscribe(subscription)
+
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 # Projects Management
 @admin.route('/admin/projects')
 @login_required
 def manage_projects():
-    projects = Projects.query.order_by(Projects.created_at.desc()).all()
+    projects = paginate(Projects.query.options(PROJECT_LIST_COLUMNS), Projects, PROJECT_SORTS, 'created')
     
     # Check if we're in edit mode
     edit_id = request.args.get('edit')
     edit_project = None
     if edit_id:
         try:
-            edit_project = Projects.query.get(int(edit_id))
+            edit_project = edit_item(projects, Projects, int(edit_id))
         except:
             flash('Invalid project ID', 'error')
     
@@ -56,19 +122,16 @@ def add_project():
             featured=bool(request.form.get('featured'))
         )
         
-        if 'image' in request.files:
-            file = request.files['image']
-            if file and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                filepath = os.path.join('frontend/static/uploads/projects', filename)
-                file.save(filepath)
-                project.image_url = f'uploads/projects/{filename}'
+        image_url = save_image_upload('image', 'projects')
+        if image_url:
+            set_image(project, 'image_url', image_url)
         
         db.session.add(project)
         db.session.commit()
         flash('Project added successfully!', 'success')
     except Exception as e:
         db.session.rollback()
+        current_app.logger.exception('Error adding project')
         flash('Error adding project: ' + str(e), 'error')
     
     return redirect(url_for('admin.manage_projects'))
@@ -91,29 +154,11 @@ def edit_project(id):
         featured_value = request.form.get('featured')
         project.featured = featured_value == 'true'
         
-        # Handle file upload
-        if 'image' in request.files:
-            file = request.files['image']
-            if file and file.filename != '' and allowed_file(file.filename):
-                # Create upload directory if it doesn't exist
-                upload_dir = os.path.join('frontend', 'static', 'uploads', 'projects')
-                os.makedirs(upload_dir, exist_ok=True)
-                
-                # Generate secure filename
-                filename = secure_filename(file.filename)
-                # Add timestamp to avoid filename conflicts
-                name, ext = os.path.splitext(filename)
-                timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
-                filename = f"{name}_{timestamp}{ext}"
-                
-                # Save file
-                filepath = os.path.join(upload_dir, filename)
-                file.save(filepath)
-                
-                # Update project image URL
-                project.image_url = f'uploads/projects/{filename}'
-                
-                flash(f'Project image updated: {filename}', 'success')
+        # Handle file upload (direct or via the chunked upload endpoints)
+        image_url = save_image_upload('image', 'projects')
+        if image_url:
+            set_image(project, 'image_url', image_url)
+            flash(f'Project image updated: {os.path.basename(image_url)}', 'success')
         
         # Update timestamp
         project.updated_at = datetime.utcnow()
@@ -123,6 +168,7 @@ def edit_project(id):
         
     except Exception as e:
         db.session.rollback()
+        current_app.logger.exception('Error updating project')
         flash(f'Error updating project: {str(e)}', 'error')
         # Return to edit form with error
         return render_template('admin/edit_project.html', project=project)
@@ -139,6 +185,7 @@ def delete_project(id):
         flash('Project deleted successfully!', 'success')
     except Exception as e:
         db.session.rollback()
+        current_app.logger.exception('Error deleting project')
         flash('Error deleting project: ' + str(e), 'error')
     
     return redirect(url_for('admin.manage_projects'))
@@ -147,14 +194,14 @@ def delete_project(id):
 @admin.route('/admin/skills')
 @login_required
 def manage_skills():
-    skills = Skills.query.order_by(Skills.display_order).all()
+    skills = paginate(Skills.query, Skills, SKILL_SORTS, 'order', 'asc')
     
     # Check if we're in edit mode
     edit_id = request.args.get('edit')
     edit_skill = None
     if edit_id:
         try:
-            edit_skill = Skills.query.get(int(edit_id))
+            edit_skill = edit_item(skills, Skills, int(edit_id))
         except:
             flash('Invalid skill ID', 'error')
     
@@ -176,6 +223,7 @@ def add_skill():
         flash('Skill added successfully!', 'success')
     except Exception as e:
         db.session.rollback()
+        current_app.logger.exception('Error adding skill')
         flash('Error adding skill: ' + str(e), 'error')
     
     return redirect(url_for('admin.manage_skills'))
@@ -196,6 +244,7 @@ def edit_skill(id):
         
     except Exception as e:
         db.session.rollback()
+        current_app.logger.exception('Error updating skill')
         flash(f'Error updating skill: {str(e)}', 'error')
     
     return redirect(url_for('admin.manage_skills'))
@@ -210,6 +259,7 @@ def delete_skill(id):
         flash('Skill deleted successfully!', 'success')
     except Exception as e:
         db.session.rollback()
+        current_app.logger.exception('Error deleting skill')
         flash('Error deleting skill: ' + str(e), 'error')
     
     return redirect(url_for('admin.manage_skills'))
@@ -248,13 +298,9 @@ def update_bio():
         bio.location = request.form.get('location')
         bio.resume_url = request.form.get('resume_url')
         
-        if 'profile_image' in request.files:
-            file = request.files['profile_image']
-            if file and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                filepath = os.path.join('frontend/static/uploads/profile', filename)
-                file.save(filepath)
-                bio.profile_image = f'uploads/profile/{filename}'
+        profile_image = save_image_upload('profile_image', 'profile')
+        if profile_image:
+            set_image(bio, 'profile_image', profile_image)
         
         if not bio.id:
             db.session.add(bio)
@@ -262,6 +308,7 @@ def update_bio():
         flash('Bio updated successfully!', 'success')
     except Exception as e:
         db.session.rollback()
+        current_app.logger.exception('Error updating bio')
         flash('Error updating bio: ' + str(e), 'error')
     
     return redirect(url_for('admin.manage_bio'))
@@ -282,6 +329,7 @@ def add_social_link():
         flash('Social link added successfully!', 'success')
     except Exception as e:
         db.session.rollback()
+        current_app.logger.exception('Error adding social link')
         flash('Error adding social link: ' + str(e), 'error')
     
     return redirect(url_for('admin.manage_bio'))
@@ -290,8 +338,41 @@ def add_social_link():
 @admin.route('/admin/messages')
 @login_required
 def manage_messages():
-    messages = ContactSubmission.query.order_by(ContactSubmission.created_at.desc()).all()
-    return render_template('admin/messages.html', messages=messages)
+    query = ContactSubmission.query.options(
+        MESSAGE_LIST_COLUMNS,
+        with_expression(ContactSubmission.message_excerpt, excerpt(ContactSubmission.message, MESSAGE_EXCERPT))
+    )
+    unread_only = request.args.get('filter') == 'unread'
+    if unread_only:
+        query = query.filter(ContactSubmission.read.is_(False))
+    messages = paginate(query, ContactSubmission, MESSAGE_SORTS, 'received', keep=('filter',))
+    
+    total = ContactSubmission.query.count()
+    unread = ContactSubmission.query.filter_by(read=False).count()
+    return render_template('admin/messages.html',
+                           messages=messages,
+                           message_filter='unread' if unread_only else None,
+                           message_counts={'total': total, 'unread': unread, 'read': total - unread})
+
+@admin.route('/admin/messages/<int:id>')
+@login_required
+def message_detail(id):
+    """Full message body, fetched by the inbox when a truncated message is expanded"""
+    message = ContactSubmission.query.get_or_404(id)
+    return jsonify({'id': message.id, 'message': message.message})
+
+@admin.route('/admin/messages/archive')
+@login_required
+def manage_message_archive():
+    query = request.args.get('q', '').strip()
+    page = request.args.get('page', 1, type=int)
+    per_page = 50
+    messages = search_archive(query, limit=per_page + 1, offset=(max(page, 1) - 1) * per_page)
+    return render_template('admin/messages_archive.html',
+                           messages=messages[:per_page],
+                           has_next=len(messages) > per_page,
+                           page=page,
+                           query=query)
 
 @admin.route('/admin/messages/<int:id>/mark-read')
 @login_required
@@ -303,6 +384,7 @@ def mark_message_read(id):
         flash('Message marked as read!', 'success')
     except Exception as e:
         db.session.rollback()
+        current_app.logger.exception('Error updating message')
         flash('Error updating message: ' + str(e), 'error')
     
     return redirect(url_for('admin.manage_messages'))
@@ -317,6 +399,7 @@ def delete_message(id):
         flash('Message deleted successfully!', 'success')
     except Exception as e:
         db.session.rollback()
+        current_app.logger.exception('Error deleting message')
         flash('Error deleting message: ' + str(e), 'error')
     
     return redirect(url_for('admin.manage_messages'))
@@ -342,6 +425,7 @@ def edit_social_link(id):
         flash('Social link updated successfully!', 'success')
     except Exception as e:
         db.session.rollback()
+        current_app.logger.exception('Error updating social link')
         flash(f'Error updating social link: {str(e)}', 'error')
     
     return redirect(url_for('admin.manage_bio'))
@@ -356,6 +440,7 @@ def delete_social_link(id):
         flash('Social link deleted successfully!', 'success')
     except Exception as e:
         db.session.rollback()
+        current_app.logger.exception('Error deleting social link')
         flash(f'Error deleting social link: {str(e)}', 'error')
     
     return redirect(url_for('admin.manage_bio'))
@@ -366,13 +451,14 @@ def delete_social_link(id):
 @admin.route('/admin/certifications')
 @login_required
 def manage_certifications():
-    certifications = Certifications.query.order_by(Certifications.issue_date.desc()).all()
+    certifications = paginate(Certifications.query.options(CERTIFICATION_LIST_COLUMNS), Certifications,
+                              CERTIFICATION_SORTS, 'issued')
     
     edit_id = request.args.get('edit')
     edit_certification = None
     if edit_id:
         try:
-            edit_certification = Certifications.query.get(int(edit_id))
+            edit_certification = edit_item(certifications, Certifications, int(edit_id))
         except:
             flash('Invalid certification ID', 'error')
     
@@ -397,26 +483,16 @@ def add_certification():
             description=request.form.get('description', '').strip()
         )
         
-        if 'image' in request.files:
-            file = request.files['image']
-            if file and file.filename != '' and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                upload_dir = os.path.join('frontend', 'static', 'uploads', 'certifications')
-                os.makedirs(upload_dir, exist_ok=True)
-                
-                name, ext = os.path.splitext(filename)
-                timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
-                filename = f"{name}_{timestamp}{ext}"
-                
-                filepath = os.path.join(upload_dir, filename)
-                file.save(filepath)
-                certification.image_url = f'uploads/certifications/{filename}'
+        image_url = save_image_upload('image', 'certifications')
+        if image_url:
+            set_image(certification, 'image_url', image_url)
         
         db.session.add(certification)
         db.session.commit()
         flash('Certification added successfully!', 'success')
     except Exception as e:
         db.session.rollback()
+        current_app.logger.exception('Error adding certification')
         flash(f'Error adding certification: {str(e)}', 'error')
     
     return redirect(url_for('admin.manage_certifications'))
@@ -441,25 +517,15 @@ def edit_certification(id):
         certification.credential_url = request.form.get('credential_url', '').strip()
         certification.description = request.form.get('description', '').strip()
         
-        if 'image' in request.files:
-            file = request.files['image']
-            if file and file.filename != '' and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                upload_dir = os.path.join('frontend', 'static', 'uploads', 'certifications')
-                os.makedirs(upload_dir, exist_ok=True)
-                
-                name, ext = os.path.splitext(filename)
-                timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
-                filename = f"{name}_{timestamp}{ext}"
-                
-                filepath = os.path.join(upload_dir, filename)
-                file.save(filepath)
-                certification.image_url = f'uploads/certifications/{filename}'
+        image_url = save_image_upload('image', 'certifications')
+        if image_url:
+            set_image(certification, 'image_url', image_url)
         
         db.session.commit()
         flash('Certification updated successfully!', 'success')
     except Exception as e:
         db.session.rollback()
+        current_app.logger.exception('Error updating certification')
         flash(f'Error updating certification: {str(e)}', 'error')
     
     return redirect(url_for('admin.manage_certifications'))
@@ -474,6 +540,7 @@ def delete_certification(id):
         flash('Certification deleted successfully!', 'success')
     except Exception as e:
         db.session.rollback()
+        current_app.logger.exception('Error deleting certification')
         flash(f'Error deleting certification: {str(e)}', 'error')
     
     return redirect(url_for('admin.manage_certifications'))
@@ -482,13 +549,13 @@ def delete_certification(id):
 @admin.route('/admin/tools')
 @login_required
 def manage_tools():
-    tools = ToolsTechnologies.query.order_by(ToolsTechnologies.display_order).all()
+    tools = paginate(ToolsTechnologies.query, ToolsTechnologies, TOOL_SORTS, 'order', 'asc')
     
     edit_id = request.args.get('edit')
     edit_tool = None
     if edit_id:
         try:
-            edit_tool = ToolsTechnologies.query.get(int(edit_id))
+            edit_tool = edit_item(tools, ToolsTechnologies, int(edit_id))
         except:
             flash('Invalid tool ID', 'error')
     
@@ -512,6 +579,7 @@ def add_tool():
         flash('Tool added successfully!', 'success')
     except Exception as e:
         db.session.rollback()
+        current_app.logger.exception('Error adding tool')
         flash(f'Error adding tool: {str(e)}', 'error')
     
     return redirect(url_for('admin.manage_tools'))
@@ -532,6 +600,7 @@ def edit_tool(id):
         flash('Tool updated successfully!', 'success')
     except Exception as e:
         db.session.rollback()
+        current_app.logger.exception('Error updating tool')
         flash(f'Error updating tool: {str(e)}', 'error')
     
     return redirect(url_for('admin.manage_tools'))
@@ -546,6 +615,7 @@ def delete_tool(id):
         flash('Tool deleted successfully!', 'success')
     except Exception as e:
         db.session.rollback()
+        current_app.logger.exception('Error deleting tool')
         flash(f'Error deleting tool: {str(e)}', 'error')
     
     return redirect(url_for('admin.manage_tools'))
@@ -554,13 +624,16 @@ def delete_tool(id):
 @admin.route('/admin/education')
 @login_required
 def manage_education():
-    education = Education.query.order_by(Education.start_date.desc()).all()
+    education = paginate(Education.query.options(
+        EDUCATION_LIST_COLUMNS,
+        with_expression(Education.description_excerpt, excerpt(Education.description, EDUCATION_EXCERPT))
+    ), Education, EDUCATION_SORTS, 'start')
     
     edit_id = request.args.get('edit')
     edit_education = None
     if edit_id:
         try:
-            edit_education = Education.query.get(int(edit_id))
+            edit_education = edit_item(education, Education, int(edit_id))
         except:
             flash('Invalid education ID', 'error')
     
@@ -589,6 +662,7 @@ def add_education():
         flash('Education added successfully!', 'success')
     except Exception as e:
         db.session.rollback()
+        current_app.logger.exception('Error adding education')
         flash(f'Error adding education: {str(e)}', 'error')
     
     return redirect(url_for('admin.manage_education'))
@@ -618,6 +692,7 @@ def edit_education(id):
         flash('Education updated successfully!', 'success')
     except Exception as e:
         db.session.rollback()
+        current_app.logger.exception('Error updating education')
         flash(f'Error updating education: {str(e)}', 'error')
     
     return redirect(url_for('admin.manage_education'))
@@ -632,6 +707,7 @@ def delete_education(id):
         flash('Education deleted successfully!', 'success')
     except Exception as e:
         db.session.rollback()
+        current_app.logger.exception('Error deleting education')
         flash(f'Error deleting education: {str(e)}', 'error')
     
     return redirect(url_for('admin.manage_education'))
@@ -640,13 +716,13 @@ def delete_education(id):
 @admin.route('/admin/lets-talk')
 @login_required
 def manage_lets_talk():
-    lets_talk_items = LetsTalk.query.order_by(LetsTalk.display_order).all()
+    lets_talk_items = paginate(LetsTalk.query, LetsTalk, LETS_TALK_SORTS, 'order', 'asc')
     
     edit_id = request.args.get('edit')
     edit_lets_talk = None
     if edit_id:
         try:
-            edit_lets_talk = LetsTalk.query.get(int(edit_id))
+            edit_lets_talk = edit_item(lets_talk_items, LetsTalk, int(edit_id))
         except:
             flash('Invalid Let\'s Talk item ID', 'error')
     
@@ -670,6 +746,7 @@ def add_lets_talk():
         flash('Let\'s Talk item added successfully!', 'success')
     except Exception as e:
         db.session.rollback()
+        current_app.logger.exception("Error adding Let's Talk item")
         flash(f'Error adding Let\'s Talk item: {str(e)}', 'error')
     
     return redirect(url_for('admin.manage_lets_talk'))
@@ -690,6 +767,7 @@ def edit_lets_talk(id):
         flash('Let\'s Talk item updated successfully!', 'success')
     except Exception as e:
         db.session.rollback()
+        current_app.logger.exception("Error updating Let's Talk item")
         flash(f'Error updating Let\'s Talk item: {str(e)}', 'error')
     
     return redirect(url_for('admin.manage_lets_talk'))
@@ -704,6 +782,7 @@ def delete_lets_talk(id):
         flash('Let\'s Talk item deleted successfully!', 'success')
     except Exception as e:
         db.session.rollback()
+        current_app.logger.exception("Error deleting Let's Talk item")
         flash(f'Error deleting Let\'s Talk item: {str(e)}', 'error')
     
     return redirect(url_for('admin.manage_lets_talk'))
@@ -0,0 +1,154 @@
+"""Project view and click counts, buffered in memory and written behind.
+
+Public requests only bump a counter in a per-process dict. A background
+thread swaps the dict out every ANALYTICS_FLUSH_INTERVAL seconds and
+adds the totals to one ProjectStats row per project per day, so the
+write cost is a handful of statements per interval however busy the
+site is. A failed flush puts its counts back for the next attempt;
+counts still buffered when a worker is killed are lost, which is fine
+for analytics.
+"""
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import select, update, insert, func
+from models import db, Projects, ProjectStats
+from tenancy import current_tenant_id
+from background import BackgroundThread
+
+COUNTERS = ('views', 'demo_clicks', 'code_clicks')
+CLICK_TARGETS = {'demo': 'demo_clicks', 'code': 'code_clicks'}
+
+
+class ProjectAnalytics(BackgroundThread):
+    name = 'project-analytics'
+
+    def __init__(self, app, flush_interval=30, max_keys=10000):
+        super().__init__()
+        self.app = app
+        self.flush_interval = flush_interval
+        self.max_keys = max_keys
+        self.dropped = 0
+        # (tenant_id, project_id, day) -> [views, demo_clicks, code_clicks]
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def after_fork(self):
+        # The parent's counts are the parent's to write
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def _add(self, counts, key, values):
+        current = counts.get(key)
+        if current is None:
+            if len(counts) >= self.max_keys:
+                self.dropped += 1
+                return
+            current = counts[key] = [0] * len(COUNTERS)
+        for i, value in enumerate(values):
+            current[i] += value
+
+    def record(self, project_ids, counter):
+        self.ensure_started()
+        tenant_id = current_tenant_id()
+        day = datetime.utcnow().date()
+        values = [int(name == counter) for name in COUNTERS]
+        with self._lock:
+            for project_id in project_ids:
+                self._add(self._counts, (tenant_id, project_id, day), values)
+
+    def record_views(self, project_ids):
+        if project_ids:
+            self.record(project_ids, 'views')
+
+    def record_click(self, project_id, target):
+        """Count a click on a project's demo or code link; False if ``target`` is unknown"""
+        counter = CLICK_TARGETS.get(target)
+        if counter is None:
+            return False
+        self.record((project_id,), counter)
+        return True
+
+    def run(self):
+        while not self.stopping.wait(self.flush_interval):
+            self._flush_logged()
+        self._flush_logged()
+
+    def _flush_logged(self):
+        try:
+            self.flush()
+        except Exception:
+            self.app.logger.exception('Writing project analytics failed, will retry')
+        if self.dropped:
+            dropped, self.dropped = self.dropped, 0
+            self.app.logger.warning('Project analytics buffer full, dropped %d counts', dropped)
+
+    def flush(self):
+        """Write the buffered counts; returns the number of rows touched"""
+        with self._lock:
+            counts, self._counts = self._counts, {}
+        if not counts:
+            return 0
+        with self.app.app_context():
+            try:
+                written = self._write(counts)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                with self._lock:
+                    for key, values in counts.items():
+                        self._add(self._counts, key, values)
+                raise
+        return written
+
+    def _write(self, counts):
+        # Clicks come from the browser, so only ids of the counting tenant's own projects are kept
+        owners = dict(db.session.execute(
+            select(Projects.id, Projects.tenant_id).where(Projects.id.in_({key[1] for key in counts}))
+        ).all())
+        written = 0
+        for (tenant_id, project_id, day), values in counts.items():
+            if project_id not in owners or owners[project_id] != tenant_id:
+                continue
+            increments = {name: getattr(ProjectStats, name) + value
+                          for name, value in zip(COUNTERS, values) if value}
+            result = db.session.execute(
+                update(ProjectStats)
+                .where(ProjectStats.project_id == project_id, ProjectStats.day == day)
+                .values(**increments)
+                .execution_options(synchronize_session=False)
+            )
+            if not result.rowcount:
+                # Another worker inserting the same row first fails this flush; the retry updates it
+                db.session.execute(insert(ProjectStats).values(
+                    tenant_id=tenant_id, project_id=project_id, day=day, **dict(zip(COUNTERS, values))))
+            written += 1
+        return written
+
+
+def project_summary(days=30, limit=10):
+    """Views and clicks per project over the last ``days`` days, most viewed first"""
+    since = datetime.utcnow().date() - timedelta(days=days - 1)
+    views = func.sum(ProjectStats.views).label('views')
+    demo_clicks = func.sum(ProjectStats.demo_clicks).label('demo_clicks')
+    code_clicks = func.sum(ProjectStats.code_clicks).label('code_clicks')
+    rows = db.session.execute(
+        select(Projects.id, Projects.title, views, demo_clicks, code_clicks)
+        .join(ProjectStats, ProjectStats.project_id == Projects.id)
+        .where(ProjectStats.day >= since)
+        .group_by(Projects.id, Projects.title)
+        .order_by(views.desc(), Projects.id)
+        .limit(limit)
+    ).all()
+    totals = db.session.execute(
+        select(func.coalesce(func.sum(ProjectStats.views), 0),
+               func.coalesce(func.sum(ProjectStats.demo_clicks + ProjectStats.code_clicks), 0))
+        .where(ProjectStats.day >= since)
+    ).one()
+    return {'days': days, 'projects': rows, 'views': totals[0], 'clicks': totals[1]}
+
+
+def init_analytics(app):
+    analytics = ProjectAnalytics(app, flush_interval=app.config['ANALYTICS_FLUSH_INTERVAL'],
+                                 max_keys=app.config['ANALYTICS_MAX_KEYS'])
+    app.extensions['project_analytics'] = analytics
+    return analytics
@@ -1,12 +1,57 @@
 from flask import Flask, render_template, request, jsonify
 from flask_login import LoginManager
-from models import db, Projects, Skills, Bio, SocialLinks, ContactSubmission
+from models import db, Projects, Skills, Bio, SocialLinks, ContactSubmission, Certifications, ToolsTechnologies, Education, LetsTalk, excerpt
+from sqlalchemy.orm import defer, with_expression
 from auth import auth
 from admin_routes import admin
+import events  # registers the session hooks that feed the admin event stream
 from config import config
+from identity_cache import IdentityCache, SessionRevocations, load_identity
+from password_hashing import init_password_hasher
+from retention import init_retention
+from uploads import init_uploads
+from file_delivery import init_file_delivery
+from content_cache import init_content_cache
+from compression import init_compression
+from profiling import init_profiler
+from structured_logging import init_logging
+from contact_filter import init_contact_filter, rejection_response
+from notifications import init_notifications
+from analytics import init_analytics
+from tenancy import init_tenancy, current_tenant_id
+import click
+import json
 import os
 
-def create_app():
+# The portfolio cards clamp descriptions to three lines, so don't ship whole essays
+PROJECT_CARD_EXCERPT = 400
+PROJECT_CARD_COLUMNS = (defer(Projects.description),
+                        with_expression(Projects.description_excerpt, excerpt(Projects.description, PROJECT_CARD_EXCERPT)))
+
+# One query per section of /api/portfolio
+PORTFOLIO_SECTIONS = {
+    'bio': lambda: Bio.query.first(),
+    'social_links': lambda: SocialLinks.query.order_by(SocialLinks.display_order).all(),
+    'skills': lambda: Skills.query.order_by(Skills.display_order).all(),
+    'projects': lambda: Projects.query.filter_by(featured=True).order_by(Projects.created_at.desc()).all(),
+    'certifications': lambda: Certifications.query.order_by(Certifications.issue_date.desc()).all(),
+    'tools': lambda: ToolsTechnologies.query.order_by(ToolsTechnologies.display_order).all(),
+    'education': lambda: Education.query.order_by(Education.start_date.desc()).all(),
+    'lets_talk': lambda: LetsTalk.query.filter_by(is_active=True).order_by(LetsTalk.display_order).all(),
+}
+
+def serialize_section(name):
+    rows = PORTFOLIO_SECTIONS[name]()
+    if isinstance(rows, list):
+        data = [row.to_dict() for row in rows]
+    else:
+        data = rows.to_dict() if rows else None
+    return json.dumps(data, separators=(',', ':')).encode('utf-8')
+
+def published_project_ids():
+    return frozenset(row.id for row in Projects.query.filter_by(featured=True).with_entities(Projects.id))
+
+def create_app(config_name=None, test_config=None, instance_path=None):
     # Get the base directory of the project
     base_dir = os.path.abspath(os.path.dirname(os.path.dirname(__file__)))
     template_dir = os.path.join(base_dir, 'frontend', 'templates')
@@ -14,11 +59,22 @@ def create_app():
     
     app = Flask(__name__, 
                 template_folder=template_dir,
-                static_folder=static_dir)
-    app.config.from_object(config['development'])
+                static_folder=static_dir,
+                instance_path=instance_path)
+    app.config.from_object(config[config_name or os.environ.get('FLASK_CONFIG', 'default')])
+    # Settings the tests override before any extension reads them
+    if test_config:
+        app.config.update(test_config)
+    if not app.config['SECRET_KEY']:
+        raise RuntimeError('SECRET_KEY must be set')
     
     # Initialize extensions
+    init_logging(app)
     db.init_app(app)
+    init_tenancy(app)
+    init_profiler(app)
+    init_password_hasher(app)
+    init_retention(app)
     
     # Login manager
     login_manager = LoginManager()
@@ -26,14 +82,27 @@ def create_app():
     login_manager.login_view = 'auth.login'
     login_manager.login_message_category = 'error'
     
+    revocations = SessionRevocations(app.config.get('SESSION_REVOCATION_DIR')
+                                     or os.path.join(app.instance_path, 'revoked-sessions'))
+    identity_cache = IdentityCache(ttl=app.config['IDENTITY_CACHE_TTL'],
+                                   maxsize=app.config['IDENTITY_CACHE_SIZE'],
+                                   revocations=revocations)
+    app.extensions['identity_cache'] = identity_cache
+    
     @login_manager.user_loader
     def load_user(user_id):
-        from models import Admin
-        return Admin.query.get(int(user_id))
+        return load_identity(identity_cache, user_id)
     
     # Register blueprints
     app.register_blueprint(auth)
     app.register_blueprint(admin)
+    init_uploads(app)
+    init_file_delivery(app)
+    content_cache = init_content_cache(app)
+    init_compression(app)
+    contact_filter = init_contact_filter(app)
+    init_notifications(app)
+    analytics = init_analytics(app)
     
     # Create upload directories
     uploads_dir = os.path.join(static_dir, 'uploads')
@@ -46,8 +115,9 @@ def create_app():
     def index():
         bio = Bio.query.first()
         skills = Skills.query.order_by(Skills.display_order).all()
-        projects = Projects.query.filter_by(featured=True).order_by(Projects.created_at.desc()).all()
+        projects = Projects.query.options(*PROJECT_CARD_COLUMNS).filter_by(featured=True).order_by(Projects.created_at.desc()).all()
         social_links = SocialLinks.query.order_by(SocialLinks.display_order).all()
+        analytics.record_views([project.id for project in projects])
         
         return render_template('index.html', 
                              bio=bio, 
@@ -57,6 +127,12 @@ def create_app():
     
     @app.route('/contact', methods=['POST'])
     def contact():
+        # Duplicates and spam are turned away before any database work
+        reason, key = contact_filter.check(request.form, current_tenant_id())
+        if reason:
+            app.logger.info('Contact submission rejected: %s', reason)
+            return jsonify(rejection_response(reason))
+        
         try:
             name = request.form.get('name')
             email = request.form.get('email')
@@ -75,40 +151,73 @@ def create_app():
             
             return jsonify({'success': True, 'message': 'Message sent successfully!'})
         except Exception as e:
+            db.session.rollback()
+            contact_filter.forget(key)
+            app.logger.exception('Error saving contact message')
             return jsonify({'success': False, 'message': 'Error sending message: ' + str(e)})
     
     @app.route('/api/projects')
     def api_projects():
         projects = Projects.query.order_by(Projects.created_at.desc()).all()
-        projects_data = []
-        for project in projects:
-            projects_data.append({
-                'id': project.id,
-                'title': project.title,
-                'description': project.description,
-                'tech_stack': project.tech_stack,
-                'project_link': project.project_link,
-                'github_link': project.github_link,
-                'image_url': project.image_url,
-                'featured': project.featured
-            })
-        return jsonify(projects_data)
+        return jsonify([project.to_dict() for project in projects])
+    
+    @app.route('/api/track', methods=['POST'])
+    def api_track():
+        """Outbound link clicks, sent by navigator.sendBeacon as {"project_id": 1, "target": "demo"}"""
+        data = request.get_json(force=True, silent=True)
+        if not isinstance(data, dict) or type(data.get('project_id')) is not int:
+            return '', 400
+        # Only projects on the public page can be clicked; anything else would just fill the buffer
+        published = content_cache.get_or_build(('published_project_ids',), published_project_ids, current_tenant_id())
+        if data['project_id'] not in published:
+            return '', 400
+        if not analytics.record_click(data['project_id'], data.get('target')):
+            return '', 400
+        return '', 204
+    
+    @app.route('/api/portfolio')
+    def api_portfolio():
+        """Every public section in one response; ?fields=bio,skills selects a subset"""
+        fields = request.args.get('fields')
+        names = [name.strip() for name in fields.split(',') if name.strip()] if fields else list(PORTFOLIO_SECTIONS)
+        unknown = [name for name in names if name not in PORTFOLIO_SECTIONS]
+        if unknown:
+            return jsonify({'error': 'Unknown fields: ' + ', '.join(unknown)}), 400
+        
+        # Sections are serialized once per content version and spliced together
+        tenant = current_tenant_id()
+        parts = [json.dumps(name).encode('utf-8') + b':' +
+                 content_cache.get_or_build(('portfolio', name), lambda name=name: serialize_section(name), tenant)
+                 for name in dict.fromkeys(names)]
+        response = app.response_class(b'{' + b','.join(parts) + b'}', mimetype='application/json')
+        response.add_etag()
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
+    
+    @app.cli.command('create-admin')
+    @click.option('--username', default='admin')
+    @click.option('--password', prompt=True, hide_input=True, confirmation_prompt=True)
+    def create_admin_command(username, password):
+        """Create the tables if needed and add an admin account."""
+        from models import Admin
+        db.create_all()
+        if Admin.query.filter_by(username=username).first():
+            print(f"Admin '{username}' already exists")
+            return
+        admin = Admin(username=username)
+        admin.set_password(password)
+        db.session.add(admin)
+        db.session.commit()
+        print(f"Admin '{username}' created")
     
     return app
 
 if __name__ == '__main__':
-    app = create_app()
+    # Development server only; see gunicorn.conf.py for production.
+    # Admin accounts come from database/init_db.py or `flask create-admin`.
+    app = create_app(os.environ.get('FLASK_CONFIG', 'development'))
     
     with app.app_context():
         db.create_all()
-        
-        # Create default admin if not exists
-        from models import Admin
-        if not Admin.query.first():
-            admin = Admin(username='admin')
-            admin.set_password('admin123')
-            db.session.add(admin)
-            db.session.commit()
-            print("Default admin created: username='admin', password='admin123'")
     
-    app.run(debug=True)
+    app.run(debug=app.config['DEBUG'])
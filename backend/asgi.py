@@ -0,0 +1,301 @@
+"""ASGI entry point: async public views in front of the regular Flask app.
+
+Run with ``uvicorn asgi:app`` from the backend directory. ``/``,
+``/api/projects`` and ``/contact`` are served by coroutines on an async
+database engine, so slow or idle keep-alive clients only cost a socket
+and a task. So is the admin event stream, which holds its connection
+for minutes. Every other path (admin, auth, static files) goes to the
+unchanged WSGI app, run on a pool of ASGI_WSGI_THREADS threads so one
+slow admin request doesn't hold up the others.
+"""
+import asyncio
+import io
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+from flask import request, render_template, jsonify, Response
+from flask_login import current_user
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from app import create_app, PROJECT_CARD_COLUMNS
+from admin_routes import DASHBOARD_COUNTS
+from events import broker, format_sse
+from contact_filter import rejection_response
+from tenancy import current_tenant_id
+from models import Projects, Skills, Bio, SocialLinks, ContactSubmission
+from background import ProcessLocal
+
+
+def async_database_uri(uri):
+    """Map a sync SQLAlchemy URL onto the matching async driver"""
+    scheme, sep, rest = uri.partition('://')
+    backend = scheme.split('+', 1)[0]
+    if backend in ('postgresql', 'postgres'):
+        return f'postgresql+asyncpg{sep}{rest}'
+    if backend == 'sqlite':
+        return f'sqlite+aiosqlite{sep}{rest}'
+    return uri
+
+
+def build_environ(scope, body):
+    """Build a WSGI environ for an ASGI HTTP scope so Flask's request context works"""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': 'HTTP/%s' % scope.get('http_version', '1.1'),
+        'REMOTE_ADDR': client[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for raw_name, raw_value in scope.get('headers', []):
+        name = raw_name.decode('latin-1').upper().replace('-', '_')
+        value = raw_value.decode('latin-1')
+        if name in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            environ[name] = value
+            continue
+        key = 'HTTP_' + name
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    # The body is already buffered; its real length is what the form parser must read
+    environ['CONTENT_LENGTH'] = str(len(body))
+    return environ
+
+
+class PooledWsgiInstance(WsgiToAsgiInstance):
+    # asgiref runs every request on one shared thread (thread_sensitive=True); Flask doesn't need that
+    _run_wsgi_app = WsgiToAsgiInstance.__dict__['run_wsgi_app'].func
+
+    def __init__(self, wsgi_application, executor):
+        super().__init__(wsgi_application)
+        self.executor = executor
+
+    async def run_wsgi_app(self, body):
+        await sync_to_async(self._run_wsgi_app, thread_sensitive=False, executor=self.executor)(body)
+
+
+class PooledWsgiToAsgi(WsgiToAsgi):
+    """WsgiToAsgi with requests spread over a bounded thread pool"""
+
+    def __init__(self, wsgi_application, max_threads):
+        super().__init__(wsgi_application)
+        self._executor = ProcessLocal(lambda: ThreadPoolExecutor(max_workers=max_threads,
+                                                                 thread_name_prefix='wsgi-fallback'))
+
+    async def __call__(self, scope, receive, send):
+        await PooledWsgiInstance(self.wsgi_application, self._executor.get())(scope, receive, send)
+
+
+class PortfolioASGI:
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.wsgi = PooledWsgiToAsgi(flask_app, flask_app.config['ASGI_WSGI_THREADS'])
+        uri = flask_app.config.get('ASYNC_DATABASE_URL') or \
+            async_database_uri(flask_app.config['SQLALCHEMY_DATABASE_URI'])
+        self.engine = create_async_engine(uri, pool_pre_ping=True)
+        self.sessions = async_sessionmaker(self.engine, expire_on_commit=False)
+        self.routes = {
+            ('GET', '/'): self.index,
+            ('GET', '/api/projects'): self.api_projects,
+            ('POST', '/contact'): self.contact,
+            ('GET', '/admin/events'): self.admin_events,
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        view = None
+        if scope['type'] == 'http':
+            view = self.routes.get((scope['method'], scope['path']))
+        if view is None:
+            return await self.wsgi(scope, receive, send)
+        await self.dispatch(view, scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.engine.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def read_body(self, receive):
+        limit = self.flask_app.config.get('MAX_CONTENT_LENGTH')
+        chunks, size = [], 0
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return None
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if limit and size > limit:
+                return None
+            chunks.append(chunk)
+            if not message.get('more_body'):
+                return b''.join(chunks)
+
+    async def dispatch(self, view, scope, receive, send):
+        body = await self.read_body(receive)
+        if body is None:
+            return await self.send_response(send, self.flask_app.response_class('Request Entity Too Large', status=413))
+
+        app = self.flask_app
+        ctx = app.request_context(build_environ(scope, body))
+        ctx.push()
+        try:
+            # Same before/after request hooks and error handlers as the sync app
+            try:
+                try:
+                    rv = app.preprocess_request()
+                    if rv is None:
+                        rv = await view()
+                except Exception as e:
+                    rv = app.handle_user_exception(e)
+                response = app.finalize_request(rv)
+            except Exception as e:
+                # Unhandled errors get the 500 handling, logging and signals of Flask.full_dispatch_request
+                response = app.handle_exception(e)
+        finally:
+            ctx.pop()
+        await self.send_response(send, response, receive)
+
+    async def send_response(self, send, response, receive=None):
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': [(k.lower().encode('latin-1'), v.encode('latin-1'))
+                        for k, v in response.headers.to_wsgi_list()],
+        })
+        if hasattr(response.response, '__aiter__'):
+            return await self.stream_body(send, receive, response.response)
+        await send({'type': 'http.response.body', 'body': response.get_data()})
+
+    async def stream_body(self, send, receive, body):
+        """Send an async iterable body until it ends or the client goes away"""
+        async def pump():
+            async for chunk in body:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode('utf-8')
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            await send({'type': 'http.response.body'})
+
+        async def disconnected():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+
+        sending = asyncio.ensure_future(pump())
+        watching = asyncio.ensure_future(disconnected())
+        try:
+            done, _ = await asyncio.wait((sending, watching), return_when=asyncio.FIRST_COMPLETED)
+            if sending in done:
+                sending.result()
+        finally:
+            sending.cancel()
+            watching.cancel()
+            await asyncio.gather(sending, watching, return_exceptions=True)
+            # Runs the body's finally blocks (e.g. unsubscribing) now rather than at garbage collection
+            if hasattr(body, 'aclose'):
+                await body.aclose()
+
+    # Public views, mirroring the sync ones in app.py
+    async def index(self):
+        async with self.sessions() as session:
+            bio = (await session.scalars(select(Bio).limit(1))).first()
+            skills = (await session.scalars(select(Skills).order_by(Skills.display_order))).all()
+            projects = (await session.scalars(
+                select(Projects).options(*PROJECT_CARD_COLUMNS)
+                .filter_by(featured=True).order_by(Projects.created_at.desc()))).all()
+            social_links = (await session.scalars(
+                select(SocialLinks).order_by(SocialLinks.display_order))).all()
+        self.flask_app.extensions['project_analytics'].record_views([project.id for project in projects])
+
+        return render_template('index.html',
+                               bio=bio,
+                               skills=skills,
+                               projects=projects,
+                               social_links=social_links)
+
+    async def api_projects(self):
+        async with self.sessions() as session:
+            projects = (await session.scalars(select(Projects).order_by(Projects.created_at.desc()))).all()
+        return jsonify([project.to_dict() for project in projects])
+
+    async def contact(self):
+        contact_filter = self.flask_app.extensions['contact_filter']
+        reason, key = contact_filter.check(request.form, current_tenant_id())
+        if reason:
+            self.flask_app.logger.info('Contact submission rejected: %s', reason)
+            return jsonify(rejection_response(reason))
+
+        try:
+            contact_submission = ContactSubmission(
+                name=request.form.get('name'),
+                email=request.form.get('email'),
+                subject=request.form.get('subject'),
+                message=request.form.get('message')
+            )
+
+            async with self.sessions() as session:
+                session.add(contact_submission)
+                await session.commit()
+
+            return jsonify({'success': True, 'message': 'Message sent successfully!'})
+        except Exception as e:
+            contact_filter.forget(key)
+            self.flask_app.logger.exception('Error saving contact message')
+            return jsonify({'success': False, 'message': 'Error sending message: ' + str(e)})
+
+
+    async def admin_events(self):
+        """The admin server-sent events stream, as admin_routes.events but without holding a thread"""
+        if not current_user.is_authenticated:
+            return self.flask_app.login_manager.unauthorized()
+
+        # Subscribe before taking the snapshot so no change falls between the two
+        subscription = broker.subscribe_async(current_tenant_id())
+        try:
+            async with self.sessions() as session:
+                snapshot = {key: await session.scalar(query) for key, query in DASHBOARD_COUNTS.items()}
+        except Exception:
+            broker.unsubscribe(subscription)
+            raise
+        keepalive = self.flask_app.config['SSE_KEEPALIVE']
+        max_age = self.flask_app.config['SSE_MAX_AGE']
+
+        async def stream():
+            # No database access in here: the request context is gone
+            deadline = time.monotonic() + max_age
+            try:
+                yield f'retry: 3000\n{format_sse("stats", snapshot)}'
+                while time.monotonic() < deadline and not subscription.overflowed:
+                    try:
+                        name, data = await asyncio.wait_for(subscription.get(), keepalive)
+                    except asyncio.TimeoutError:
+                        yield ': keepalive\n\n'
+                        continue
+                    yield format_sse(name, data)
+            finally:
+                broker.unsubscribe(subscription)
+
+        return Response(stream(), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+def create_asgi_app(flask_app=None):
+    return PortfolioASGI(flask_app or create_app())
+
+
+app = create_asgi_app()
@@ -1,7 +1,8 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app
 from flask_login import login_user, logout_user, login_required, current_user
 from models import db, Admin
-from werkzeug.security import check_password_hash
+from identity_cache import revoke_sessions
+from password_hashing import HasherBusy
 
 auth = Blueprint('auth', __name__)
 
@@ -14,8 +15,21 @@ def login():
         username = request.form.get('username')
         password = request.form.get('password')
         admin = Admin.query.filter_by(username=username).first()
+        hasher = current_app.extensions['password_hasher']
         
-        if admin and admin.check_password(password):
+        try:
+            valid = bool(admin) and hasher.verify(admin.password_hash, password)
+            # Upgrade hashes made with older parameters while we have the plaintext
+            if valid and hasher.needs_rehash(admin.password_hash):
+                admin.password_hash = hasher.hash(password)
+                db.session.commit()
+        except HasherBusy:
+            flash('Too many login attempts right now, please try again in a moment.', 'error')
+            return render_template('admin/login.html'), 503
+        
+        if valid:
+            # Drop any snapshot cached before another worker bumped the session version
+            current_app.extensions['identity_cache'].invalidate(admin.id)
             login_user(admin)
             next_page = request.args.get('next')
             return redirect(next_page or url_for('admin.dashboard'))
@@ -27,6 +41,10 @@ def login():
 @auth.route('/admin/logout')
 @login_required
 def logout():
+    # Bump the session version so copies of this session die on every worker too
+    admin = Admin.query.get(current_user.id)
+    if admin:
+        revoke_sessions(admin)
     logout_user()
     flash('You have been logged out successfully.', 'success')
-    return redirect(url_for('main.index'))
+    return redirect(url_for('index'))
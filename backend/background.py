@@ -0,0 +1,89 @@
+"""Per-process background threads and thread pools.
+
+Threads don't survive fork(): under gunicorn's preload the app is built
+in the master and the workers are forked from it. Anything holding a
+thread is therefore created lazily, once in every process that uses
+it, and per-process state is reset in the child right after a fork.
+"""
+import atexit
+import os
+import threading
+
+
+class ProcessLocal:
+    """A value built on first use in each process, e.g. a thread pool"""
+
+    def __init__(self, factory):
+        self.factory = factory
+        self._value = None
+        self._pid = None
+        self._lock = threading.Lock()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # The parent's lock may have been held at fork time
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._value = self.factory()
+                    self._pid = os.getpid()
+        return self._value
+
+    def peek(self):
+        """The value if this process has built it, else None"""
+        return self._value if self._pid == os.getpid() else None
+
+
+class BackgroundThread:
+    """A daemon thread running ``run()``, started on first use in each process.
+
+    Subclasses reset inherited state in ``after_fork()`` and, if the
+    thread doesn't watch ``self.stopping``, wake it in ``request_stop()``.
+    ``stop()`` runs at interpreter exit so the thread can finish its work.
+    """
+
+    name = 'background'
+    stop_timeout = 5.0
+
+    def __init__(self):
+        self.stopping = threading.Event()
+        self._thread = ProcessLocal(self._start)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+        atexit.register(self.stop)
+
+    def _after_fork(self):
+        self.stopping = threading.Event()
+        self.after_fork()
+
+    def after_fork(self):
+        """Drop state inherited from the parent process"""
+
+    def _start(self):
+        thread = threading.Thread(target=self.run, name=self.name, daemon=True)
+        thread.start()
+        return thread
+
+    def ensure_started(self):
+        self._thread.get()
+
+    @property
+    def running(self):
+        thread = self._thread.peek()
+        return thread is not None and thread.is_alive()
+
+    def run(self):
+        raise NotImplementedError
+
+    def request_stop(self):
+        self.stopping.set()
+
+    def stop(self, timeout=None):
+        if not self.running:
+            return
+        self.request_stop()
+        self._thread.peek().join(self.stop_timeout if timeout is None else timeout)
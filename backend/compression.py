@@ -0,0 +1,97 @@
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+
+class CompressedVariants:
+    """LRU of compressed bodies keyed by (body key, encoding, level), bounded by total bytes"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._entries[key] = value
+            self._size += len(value)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+
+def choose_encoding(accept_encodings):
+    if brotli is not None and accept_encodings['br']:
+        return 'br'
+    if accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress(body, encoding, level):
+    if encoding == 'br':
+        return brotli.compress(body, quality=level)
+    # mtime=0 keeps the output identical for identical input
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+
+def init_compression(app):
+    variants = CompressedVariants(app.config['COMPRESSION_CACHE_BYTES'])
+    app.extensions['compressed_variants'] = variants
+    mimetypes = set(app.config['COMPRESSION_MIMETYPES'])
+    min_size = app.config['COMPRESSION_MIN_SIZE']
+    levels = {'gzip': app.config['COMPRESSION_LEVEL'], 'br': app.config['COMPRESSION_BROTLI_QUALITY']}
+
+    @app.after_request
+    def compress_response(response):
+        # Files and event streams are left alone: they are streamed, not buffered
+        if (response.mimetype not in mimetypes or response.direct_passthrough
+                or response.is_streamed or 'Content-Encoding' in response.headers):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        if response.status_code < 200 or response.status_code in (204, 304):
+            return response
+
+        encoding = choose_encoding(request.accept_encodings)
+        body = response.get_data()
+        if encoding is None or len(body) < min_size:
+            return response
+
+        # Cached responses already carry a content hash as their ETag; reuse it as the key
+        etag, _ = response.get_etag()
+        body_key = etag or hashlib.blake2b(body, digest_size=16).hexdigest()
+        key = (body_key, encoding, levels[encoding])
+        compressed = variants.get(key)
+        if compressed is None:
+            compressed = compress(body, encoding, levels[encoding])
+            variants.set(key, compressed)
+
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        if etag:
+            # Same content, different bytes: only weakly equal to the identity variant
+            response.set_etag(etag, weak=True)
+        return response
+
+    return variants
@@ -0,0 +1,126 @@
+"""Cheap rejection of duplicate and spam contact submissions.
+
+Runs before the contact views open a transaction. Exact resubmissions
+are caught with a rolling set of fingerprints of the normalized
+(tenant, email, message). Two generations are kept and swapped every
+CONTACT_DUPLICATE_WINDOW seconds, so a fingerprint is remembered for
+one to two windows at a fixed memory cost. Bots are caught by a
+honeypot field and a few content checks.
+"""
+import hashlib
+import re
+import threading
+import time
+
+HONEYPOT_FIELD = 'website'
+
+URL_RE = re.compile(r'https?://|www\.', re.IGNORECASE)
+EMAIL_RE = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+MARKUP_RE = re.compile(r'\[url=|\[link=|<a\s+href', re.IGNORECASE)
+WHITESPACE_RE = re.compile(r'\s+')
+
+
+def fingerprint(tenant_id, email, message):
+    email = (email or '').strip().lower()
+    message = WHITESPACE_RE.sub(' ', (message or '').strip().lower())
+    key = f'{tenant_id}\0{email}\0{message}'.encode('utf-8')
+    return hashlib.blake2b(key, digest_size=16).digest()
+
+
+class RollingFingerprints:
+    """Two-generation set of recently seen fingerprints"""
+
+    def __init__(self, window=3600, max_size=100000):
+        self.window = window
+        self.max_size = max_size
+        self._current = set()
+        self._previous = set()
+        self._rotated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _rotate(self, now):
+        if now - self._rotated_at >= self.window or len(self._current) >= self.max_size:
+            self._previous, self._current = self._current, set()
+            self._rotated_at = now
+
+    def add(self, key):
+        """Record ``key``; returns False if it was already there"""
+        with self._lock:
+            self._rotate(time.monotonic())
+            if key in self._current or key in self._previous:
+                return False
+            self._current.add(key)
+            return True
+
+    def discard(self, key):
+        with self._lock:
+            self._current.discard(key)
+            self._previous.discard(key)
+
+
+class ContactFilter:
+    def __init__(self, window=3600, max_size=100000, max_links=3, min_length=2, max_length=5000):
+        self.seen = RollingFingerprints(window, max_size)
+        self.max_links = max_links
+        self.min_length = min_length
+        self.max_length = max_length
+
+    def spam_reason(self, form):
+        """Why ``form`` looks like spam, or None"""
+        if form.get(HONEYPOT_FIELD):
+            return 'honeypot'
+        email = (form.get('email') or '').strip()
+        message = (form.get('message') or '').strip()
+        name = form.get('name') or ''
+        if not EMAIL_RE.match(email):
+            return 'invalid email'
+        if not self.min_length <= len(message) <= self.max_length:
+            return 'message length'
+        if URL_RE.search(name) or MARKUP_RE.search(message):
+            return 'markup'
+        if len(URL_RE.findall(message)) > self.max_links:
+            return 'too many links'
+        return None
+
+    def check(self, form, tenant_id=None):
+        """Return (reason, key); a reason means the submission must not be stored.
+
+        An accepted submission's fingerprint is recorded straight away so
+        concurrent resubmissions are caught too; call ``forget(key)`` if
+        storing it then fails, so the sender can retry.
+        """
+        reason = self.spam_reason(form)
+        if reason:
+            return reason, None
+        key = fingerprint(tenant_id, form.get('email'), form.get('message'))
+        if not self.seen.add(key):
+            return 'duplicate', None
+        return None, key
+
+    def forget(self, key):
+        if key is not None:
+            self.seen.discard(key)
+
+
+# Answers given without storing anything. Bots and resubmissions get the
+# normal success reply, so there's nothing to probe or retry.
+SILENT_REJECTIONS = ('honeypot', 'duplicate')
+
+
+def rejection_response(reason):
+    if reason in SILENT_REJECTIONS:
+        return {'success': True, 'message': 'Message sent successfully!'}
+    if reason == 'invalid email':
+        return {'success': False, 'message': 'Please enter a valid email address.'}
+    if reason == 'message length':
+        return {'success': False, 'message': 'Please check the length of your message.'}
+    return {'success': False, 'message': 'Your message looks like spam and was not sent.'}
+
+
+def init_contact_filter(app):
+    contact_filter = ContactFilter(window=app.config['CONTACT_DUPLICATE_WINDOW'],
+                                   max_size=app.config['CONTACT_FINGERPRINTS_MAX'],
+                                   max_links=app.config['CONTACT_MAX_LINKS'],
+                                   max_length=app.config['CONTACT_MAX_LENGTH'])
+    app.extensions['contact_filter'] = contact_filter
+    return contact_filter
@@ -0,0 +1,118 @@
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from models import Bio, SocialLinks, Skills, Projects, Certifications, ToolsTechnologies, Education, LetsTalk
+
+# Models whose rows end up on the public portfolio
+CONTENT_MODELS = (Bio, SocialLinks, Skills, Projects, Certifications, ToolsTechnologies, Education, LetsTalk)
+
+
+class ContentCache:
+    """Versioned cache for rendered/serialized public content, partitioned by tenant.
+
+    Each tenant (None in single-tenant mode) has its own version, bumped
+    whenever a session commits a change to one of its CONTENT_MODELS rows,
+    which drops that tenant's entries only. Other workers only see their
+    own commits, so entries also expire after ``ttl`` seconds to bound how
+    stale another worker's copy can get.
+
+    A tenant may hold at most ``tenant_maxsize`` entries. When the cache
+    as a whole is full, the least recently used entry of the tenant with
+    the most entries goes first, so one busy portfolio can't push every
+    other one out.
+    """
+
+    def __init__(self, ttl=30, maxsize=256, tenant_maxsize=64):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.tenant_maxsize = tenant_maxsize
+        self._versions = {}
+        self._partitions = {}
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def version(self, tenant=None):
+        return self._versions.get(tenant, 0)
+
+    def get(self, key, tenant=None):
+        with self._lock:
+            partition = self._partitions.get(tenant)
+            entry = partition.get(key) if partition else None
+            if entry is None:
+                return None
+            version, expires_at, value = entry
+            if version != self.version(tenant) or expires_at < time.monotonic():
+                del partition[key]
+                self._size -= 1
+                return None
+            partition.move_to_end(key)
+            return value
+
+    def set(self, key, value, tenant=None, version=None):
+        with self._lock:
+            # Skip values built from data that changed while they were being built
+            if version is not None and version != self.version(tenant):
+                return
+            partition = self._partitions.setdefault(tenant, OrderedDict())
+            if key in partition:
+                self._size -= 1
+            partition[key] = (self.version(tenant), time.monotonic() + self.ttl, value)
+            partition.move_to_end(key)
+            self._size += 1
+
+            while len(partition) > self.tenant_maxsize:
+                partition.popitem(last=False)
+                self._size -= 1
+            while self._size > self.maxsize:
+                largest = max(self._partitions.values(), key=len)
+                largest.popitem(last=False)
+                self._size -= 1
+
+    def get_or_build(self, key, builder, tenant=None):
+        value = self.get(key, tenant)
+        if value is None:
+            version = self.version(tenant)
+            value = builder()
+            self.set(key, value, tenant, version)
+        return value
+
+    def bump(self, tenant=None):
+        with self._lock:
+            self._versions[tenant] = self.version(tenant) + 1
+            partition = self._partitions.pop(tenant, None)
+            if partition:
+                self._size -= len(partition)
+
+
+# Registered once for all apps: the cache bumped is the one of the app the commit ran under
+@event.listens_for(Session, 'after_flush')
+def _note_content_changes(session, flush_context):
+    changed = session.info.setdefault('content_changed', set())
+    for obj in session.new | session.dirty | session.deleted:
+        if isinstance(obj, CONTENT_MODELS):
+            changed.add(obj.tenant_id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _bump_content_version(session):
+    changed = session.info.pop('content_changed', ())
+    cache = current_app.extensions.get('content_cache') if has_app_context() else None
+    if cache is not None:
+        for tenant in changed:
+            cache.bump(tenant)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_content_changes(session):
+    session.info.pop('content_changed', None)
+
+
+def init_content_cache(app):
+    cache = ContentCache(ttl=app.config['CONTENT_CACHE_TTL'],
+                         maxsize=app.config['CONTENT_CACHE_SIZE'],
+                         tenant_maxsize=app.config['CONTENT_CACHE_TENANT_SIZE'])
+    app.extensions['content_cache'] = cache
+    return cache
@@ -0,0 +1,166 @@
+import asyncio
+import json
+import queue
+import threading
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from models import Projects, Skills, ContactSubmission, Certifications, ToolsTechnologies, Education, LetsTalk
+
+# Dashboard counter each model contributes to
+COUNTERS = {
+    Projects: 'projects_count',
+    Skills: 'skills_count',
+    Certifications: 'certifications_count',
+    ToolsTechnologies: 'tools_count',
+    Education: 'education_count',
+    LetsTalk: 'lets_talk_count',
+    ContactSubmission: 'total_messages',
+}
+
+
+class AsyncSubscription:
+    """A subscriber queue read by a coroutine on an event loop.
+
+    Publishers run on whatever thread committed the change, so items are
+    handed to the loop with call_soon_threadsafe. put_nowait() raises
+    queue.Full like queue.Queue does, which is all the broker relies on.
+    """
+
+    def __init__(self, maxsize, tenant_id=None):
+        self.maxsize = maxsize
+        self.tenant_id = tenant_id
+        self.overflowed = False
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def put_nowait(self, item):
+        with self._lock:
+            if self._size >= self.maxsize:
+                raise queue.Full
+            self._size += 1
+        try:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, item)
+        except RuntimeError:
+            # The loop has shut down; nobody is reading any more
+            raise queue.Full
+
+    async def get(self):
+        item = await self._queue.get()
+        with self._lock:
+            self._size -= 1
+        return item
+
+
+class EventBroker:
+    """In-process pub/sub feeding the admin server-sent events stream.
+
+    Each subscriber gets a bounded queue. A subscriber that falls behind
+    is flagged as overflowed rather than blocking publishers; its stream
+    then closes so the browser reconnects and gets a fresh snapshot.
+    Events only reach dashboards connected to the same worker process.
+    """
+
+    def __init__(self, max_queue=100):
+        self.max_queue = max_queue
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self, tenant_id=None):
+        q = queue.Queue(maxsize=self.max_queue)
+        q.overflowed = False
+        q.tenant_id = tenant_id
+        with self._lock:
+            self._subscribers.add(q)
+        return q
+
+    def subscribe_async(self, tenant_id=None):
+        """Subscribe from a coroutine; must be called on the loop that reads the events"""
+        q = AsyncSubscription(self.max_queue, tenant_id)
+        with self._lock:
+            self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def publish(self, name, data, tenant_id=None):
+        with self._lock:
+            subscribers = [q for q in self._subscribers if q.tenant_id == tenant_id]
+        for q in subscribers:
+            try:
+                q.put_nowait((name, data))
+            except queue.Full:
+                q.overflowed = True
+                self.unsubscribe(q)
+
+
+broker = EventBroker()
+
+
+def format_sse(name, data):
+    return f'event: {name}\ndata: {json.dumps(data)}\n\n'
+
+
+def _pending(session):
+    return session.info.setdefault('pending_events', {'counts': {}, 'messages': []})
+
+
+def _bump(counts, obj, key, delta):
+    # Counters are kept per tenant so each dashboard only sees its own portfolio
+    tenant_counts = counts.setdefault(obj.tenant_id, {})
+    tenant_counts[key] = tenant_counts.get(key, 0) + delta
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changes(session, flush_context):
+    pending = _pending(session)
+    counts = pending['counts']
+
+    for obj in session.new:
+        key = COUNTERS.get(type(obj))
+        if key:
+            _bump(counts, obj, key, 1)
+        if isinstance(obj, ContactSubmission):
+            if not obj.read:
+                _bump(counts, obj, 'unread_messages', 1)
+            pending['messages'].append((obj.tenant_id, {
+                'id': obj.id,
+                'name': obj.name,
+                'email': obj.email,
+                'subject': obj.subject,
+                'created_at': obj.created_at.isoformat() if obj.created_at else None,
+            }))
+
+    for obj in session.deleted:
+        key = COUNTERS.get(type(obj))
+        if key:
+            _bump(counts, obj, key, -1)
+        if isinstance(obj, ContactSubmission) and not obj.read:
+            _bump(counts, obj, 'unread_messages', -1)
+
+    for obj in session.dirty:
+        if isinstance(obj, ContactSubmission):
+            history = inspect(obj).attrs.read.history
+            if history.has_changes():
+                _bump(counts, obj, 'unread_messages', -1 if obj.read else 1)
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_changes(session):
+    pending = session.info.pop('pending_events', None)
+    if not pending:
+        return
+    for tenant_id, message in pending['messages']:
+        broker.publish('new_message', message, tenant_id)
+    for tenant_id, tenant_counts in pending['counts'].items():
+        counts = {key: delta for key, delta in tenant_counts.items() if delta}
+        if counts:
+            broker.publish('counts', counts, tenant_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changes(session):
+    session.info.pop('pending_events', None)
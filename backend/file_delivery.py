@@ -0,0 +1,83 @@
+"""Static file delivery, optionally handed off to the front proxy.
+
+FILE_DELIVERY picks who moves the bytes of files under the static folder
+(uploads, the resume PDF, CSS and JS):
+
+- ``sendfile``: the app answers, and the open file is handed to the
+  server's wsgi.file_wrapper so gunicorn copies it with os.sendfile().
+  Range requests get the same treatment on gunicorn.
+- ``x-accel-redirect``: nginx. The app checks the path and answers
+  conditional requests, then points nginx at the file through an
+  internal location (FILE_DELIVERY_ACCEL_PREFIX); nginx sends it and
+  handles Range. The worker is free as soon as the headers are out.
+- ``x-sendfile``: the same for Apache mod_xsendfile and lighttpd, which
+  are given the absolute path in an X-Sendfile header.
+
+Resumable uploads are named after the SHA-256 of their content, so a
+name always means the same bytes and they are cached for a year as
+immutable. Form uploads only get a timestamp and everything else is
+revalidated through its ETag and Last-Modified, as before.
+"""
+import os
+import re
+from urllib.parse import quote
+from flask import current_app, request, abort
+from werkzeug.security import safe_join
+from werkzeug.utils import send_file
+
+DELIVERY_MODES = ('sendfile', 'x-accel-redirect', 'x-sendfile')
+# name_<first 12 hex digits of the sha256>.ext, as given by uploads.ChunkStore.finish
+IMMUTABLE_NAME = re.compile(r'uploads/(?:.+/)?[^/]+_[0-9a-f]{12}(?:\.[A-Za-z0-9]+)?')
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+READ_SIZE = 64 * 1024
+
+
+def _sendfile_range(response, path, environ):
+    """Serve a 206 from a seeked file so gunicorn can sendfile() just that range.
+
+    gunicorn sends Content-Length bytes from the file's current offset;
+    other servers would read to the end, so they keep Werkzeug's wrapper.
+    """
+    if 'wsgi.file_wrapper' not in environ or not environ.get('SERVER_SOFTWARE', '').startswith('gunicorn'):
+        return response
+    start = response.content_range.start
+    response.close()
+    file = open(path, 'rb')
+    file.seek(start)
+    response.response = environ['wsgi.file_wrapper'](file, READ_SIZE)
+    return response
+
+
+def send_static(filename):
+    """Send ``filename`` from the static folder the way FILE_DELIVERY asks"""
+    app = current_app
+    path = safe_join(app.static_folder, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+
+    immutable = IMMUTABLE_NAME.fullmatch(filename) is not None
+    mode = app.config['FILE_DELIVERY']
+    environ = request.environ
+    if mode != 'sendfile':
+        # The proxy sees the original Range header and answers it from the file itself
+        environ = {k: v for k, v in environ.items() if k not in ('HTTP_RANGE', 'HTTP_IF_RANGE')}
+    max_age = IMMUTABLE_MAX_AGE if immutable else app.get_send_file_max_age(filename)
+    response = send_file(path, environ, max_age=max_age, use_x_sendfile=mode != 'sendfile',
+                         response_class=app.response_class)
+    if immutable:
+        response.cache_control.immutable = True
+
+    if mode == 'sendfile':
+        if response.status_code == 206:
+            response = _sendfile_range(response, path, environ)
+    elif mode == 'x-accel-redirect' and 'X-Sendfile' in response.headers:
+        del response.headers['X-Sendfile']
+        response.headers['X-Accel-Redirect'] = app.config['FILE_DELIVERY_ACCEL_PREFIX'] + quote(filename)
+    return response
+
+
+def init_file_delivery(app):
+    if app.config['FILE_DELIVERY'] not in DELIVERY_MODES:
+        raise ValueError(f"FILE_DELIVERY must be one of {', '.join(DELIVERY_MODES)}")
+    # Flask's static route keeps its URL rule (and url_for('static')); only the view changes
+    app.view_functions['static'] = send_static
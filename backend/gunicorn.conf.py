@@ -0,0 +1,55 @@
+# Production server settings: gunicorn -c gunicorn.conf.py  (run from backend/)
+#
+# The app is imported once in the master and workers are forked from it, so
+# templates, code and caches built at import time are shared copy-on-write.
+# Graceful reload:
+#   kill -HUP <master>   re-reads this file and replaces workers one by one
+#                        (with preload, application code is not re-imported)
+#   kill -USR2 <master>  starts a new master with fresh code next to the old
+#                        one; then kill -WINCH and -QUIT the old master once
+#                        the new workers are up, for a zero-downtime deploy
+import gc
+import multiprocessing
+import os
+
+os.environ.setdefault('FLASK_CONFIG', 'production')
+
+cores = multiprocessing.cpu_count()
+
+# SERVER_MODE=asgi serves the async public views from asgi.py on uvicorn workers
+if os.environ.get('SERVER_MODE', 'wsgi') == 'asgi':
+    wsgi_app = 'asgi:app'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+    workers = int(os.environ.get('WEB_CONCURRENCY', cores))
+else:
+    wsgi_app = 'wsgi:app'
+    worker_class = 'gthread'
+    workers = int(os.environ.get('WEB_CONCURRENCY', cores * 2 + 1))
+    # Threads absorb slow clients; admin event streams are only served in asgi mode (SSE_WSGI)
+    # Two per core, capped so each worker's share of database connections stays small
+    threads = int(os.environ.get('THREADS', min(cores * 2, 8)))
+
+bind = os.environ.get('BIND', '0.0.0.0:' + os.environ.get('PORT', '8000'))
+preload_app = True
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+# Recycle workers now and then to cap slow memory growth
+max_requests = 5000
+max_requests_jitter = 500
+
+
+def when_ready(server):
+    # Keep objects created while preloading out of the collector's reach, so
+    # the GC doesn't touch (and un-share) their pages in every worker
+    gc.collect()
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Database connections must not be shared across processes
+    from models import db
+    app = server.app.wsgi()
+    flask_app = getattr(app, 'flask_app', app)
+    with flask_app.app_context():
+        db.engine.dispose(close=False)
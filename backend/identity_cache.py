@@ -0,0 +1,159 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from flask_login import UserMixin
+
+
+class AdminIdentity(UserMixin):
+    """Lightweight, session-independent snapshot of an Admin row"""
+
+    def __init__(self, id, username, session_version, tenant_id=None):
+        self.id = id
+        self.username = username
+        self.session_version = session_version
+        self.tenant_id = tenant_id
+
+    def get_id(self):
+        return f'{self.id}:{self.session_version}'
+
+
+class SessionRevocations:
+    """One marker file per admin, replaced whenever their sessions are revoked.
+
+    Cached identities remember the marker they were loaded under, so a
+    revocation on one worker makes every other worker reload the admin
+    on its next request. Checking costs one stat() per request. All
+    workers have to see the same directory; on one host they do.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, admin_id):
+        return os.path.join(self.directory, f'admin-{admin_id}')
+
+    def marker(self, admin_id):
+        try:
+            stat = os.stat(self._path(admin_id))
+        except FileNotFoundError:
+            return None
+        # A replaced file has a new inode even when the clock is too coarse to change the mtime
+        return stat.st_ino, stat.st_mtime_ns
+
+    def revoke(self, admin_id):
+        path = self._path(admin_id)
+        tmp = f'{path}.{os.getpid()}.{threading.get_ident()}'
+        with open(tmp, 'w') as f:
+            f.write(f'{time.time()}\n')
+        os.replace(tmp, path)
+
+
+class IdentityCache:
+    """Small TTL + LRU cache of admin identities keyed by admin id.
+
+    Entries are snapshots, so they stay valid across requests without
+    holding on to a SQLAlchemy session. A session only matches an entry
+    when its stamped session_version equals the cached one. Revoking an
+    admin's sessions bumps that version in the database and, through
+    ``revocations``, drops the entry on every worker before its next
+    request. A session newer than the entry reloads it instead of being
+    turned away.
+    """
+
+    def __init__(self, ttl=60, maxsize=128, revocations=None):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.revocations = revocations
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def revocation_marker(self, admin_id):
+        return self.revocations.marker(admin_id) if self.revocations else None
+
+    def get(self, admin_id, marker=None):
+        """The cached identity, unless it expired or was loaded before the revocation ``marker``"""
+        with self._lock:
+            entry = self._entries.get(admin_id)
+            if entry is None:
+                return None
+            identity, loaded_marker, expires_at = entry
+            if expires_at < time.monotonic() or loaded_marker != marker:
+                del self._entries[admin_id]
+                return None
+            self._entries.move_to_end(admin_id)
+            return identity
+
+    def put(self, identity, marker=None):
+        with self._lock:
+            self._entries[identity.id] = (identity, marker, time.monotonic() + self.ttl)
+            self._entries.move_to_end(identity.id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, admin_id):
+        with self._lock:
+            self._entries.pop(admin_id, None)
+
+    def revoke(self, admin_id):
+        """Drop ``admin_id`` here and tell the other workers to do the same"""
+        self.invalidate(admin_id)
+        if self.revocations:
+            self.revocations.revoke(admin_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def parse_session_id(session_id):
+    """Split a Flask-Login id of the form '<admin id>:<session version>'"""
+    admin_id, _, version = str(session_id).partition(':')
+    return int(admin_id), int(version or 0)
+
+
+def load_identity(cache, session_id):
+    """Resolve a session id to an identity, hitting the database only on a cache miss"""
+    from models import Admin
+    from tenancy import current_tenant_id
+
+    try:
+        admin_id, version = parse_session_id(session_id)
+    except ValueError:
+        return None
+
+    # Read before loading the admin, so a revocation committed meanwhile is caught next request
+    marker = cache.revocation_marker(admin_id)
+    identity = cache.get(admin_id, marker)
+    if identity is not None and identity.session_version < version:
+        # A login on another worker bumped the version; only that worker's cache was dropped
+        cache.invalidate(admin_id)
+        identity = None
+    if identity is None:
+        admin = Admin.query.get(admin_id)
+        if admin is None:
+            return None
+        identity = AdminIdentity(admin.id, admin.username, admin.session_version or 0, admin.tenant_id)
+        cache.put(identity, marker)
+
+    # A session is only good for the portfolio its admin belongs to
+    tenant_id = current_tenant_id()
+    if tenant_id is not None and identity.tenant_id != tenant_id:
+        return None
+
+    # Sessions issued before a password change or logout carry an old version
+    if identity.session_version != version:
+        return None
+    return identity
+
+
+def revoke_sessions(admin):
+    """Invalidate every session of ``admin`` on all workers; commits the session"""
+    from flask import current_app
+    from models import db
+
+    admin.session_version = (admin.session_version or 0) + 1
+    # Other workers reload as soon as they see the marker, so the new version has to be committed first
+    db.session.commit()
+    current_app.extensions['identity_cache'].revoke(admin.id)
@@ -1,48 +1,130 @@
 from flask_sqlalchemy import SQLAlchemy
+from flask import current_app
 from flask_login import UserMixin
+from sqlalchemy import func
+from sqlalchemy.orm import declared_attr, query_expression
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 
 db = SQLAlchemy()
 
-class Admin(UserMixin, db.Model):
+def excerpt(column, length):
+    """SQL expression for the first ``length`` characters of a text column"""
+    return func.substr(column, 1, length)
+
+class Tenant(db.Model):
+    """One hosted portfolio, resolved from the request's Host header in multi-tenant mode"""
+    id = db.Column(db.Integer, primary_key=True)
+    host = db.Column(db.String(255), unique=True, nullable=False)
+    name = db.Column(db.String(100), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class TenantScoped:
+    """Rows owned by a tenant; queries are filtered by tenancy.py when MULTI_TENANT is on"""
+    @declared_attr
+    def tenant_id(cls):
+        return db.Column(db.Integer, db.ForeignKey('tenant.id'), index=True)
+
+class Admin(UserMixin, TenantScoped, db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    username = db.Column(db.String(64), unique=True, nullable=False)
-    password_hash = db.Column(db.String(128))
+    username = db.Column(db.String(64), nullable=False)
+    password_hash = db.Column(db.String(256))
+    session_version = db.Column(db.Integer, default=0, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Usernames only need to be unique within a tenant. NULLs never compare equal in a
+    # unique constraint, so accounts without a tenant (single-tenant mode) need their own index
+    __table_args__ = (db.UniqueConstraint('tenant_id', 'username'),
+                      db.Index('uq_admin_username_no_tenant', 'username', unique=True,
+                               sqlite_where=db.text('tenant_id IS NULL'),
+                               postgresql_where=db.text('tenant_id IS NULL')))
+
+    def get_id(self):
+        # The version is stamped into the session so bumping it revokes old sessions
+        return f'{self.id}:{self.session_version or 0}'
+
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        method = current_app.config.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')
+        self.password_hash = generate_password_hash(password, method=method)
+        if self.id is not None:
+            self.session_version = (self.session_version or 0) + 1
 
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
 
-class Projects(db.Model):
+class Projects(TenantScoped, db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    title = db.Column(db.String(100), nullable=False)
+    title = db.Column(db.String(100), nullable=False, index=True)
     description = db.Column(db.Text, nullable=False)
     tech_stack = db.Column(db.String(200))
     project_link = db.Column(db.String(200))
     github_link = db.Column(db.String(200))
     image_url = db.Column(db.String(200))
+    # Recorded at upload time (see uploads.image_metadata) so pages can reserve space and show a placeholder
+    image_width = db.Column(db.Integer)
+    image_height = db.Column(db.Integer)
+    image_color = db.Column(db.String(7))
+    image_placeholder = db.Column(db.Text)
     featured = db.Column(db.Boolean, default=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-class Skills(db.Model):
+    # Filled by list queries via with_expression() when the full description is deferred
+    description_excerpt = query_expression()
+
+    stats = db.relationship('ProjectStats', cascade='all, delete-orphan', lazy='dynamic')
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'title': self.title,
+            'description': self.description,
+            'tech_stack': self.tech_stack,
+            'project_link': self.project_link,
+            'github_link': self.github_link,
+            'image_url': self.image_url,
+            'image_width': self.image_width,
+            'image_height': self.image_height,
+            'image_color': self.image_color,
+            'featured': self.featured
+        }
+
+class ProjectStats(TenantScoped, db.Model):
+    """Daily view and click totals for one project, written in batches by analytics.py"""
+    project_id = db.Column(db.Integer, db.ForeignKey('projects.id', ondelete='CASCADE'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True, index=True)
+    views = db.Column(db.Integer, default=0, nullable=False)
+    demo_clicks = db.Column(db.Integer, default=0, nullable=False)
+    code_clicks = db.Column(db.Integer, default=0, nullable=False)
+
+class Skills(TenantScoped, db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    skill_name = db.Column(db.String(50), nullable=False)
-    proficiency_level = db.Column(db.Integer, nullable=False)
+    skill_name = db.Column(db.String(50), nullable=False, index=True)
+    proficiency_level = db.Column(db.Integer, nullable=False, index=True)
     category = db.Column(db.String(50))
     icon_class = db.Column(db.String(100))
-    display_order = db.Column(db.Integer, default=0)
+    display_order = db.Column(db.Integer, default=0, index=True)
 
-class Bio(db.Model):
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'skill_name': self.skill_name,
+            'proficiency_level': self.proficiency_level,
+            'category': self.category,
+            'icon_class': self.icon_class,
+            'display_order': self.display_order
+        }
+
+class Bio(TenantScoped, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     about_me = db.Column(db.Text, nullable=False)
     tagline = db.Column(db.String(200))
     profile_image = db.Column(db.String(200))
+    profile_image_width = db.Column(db.Integer)
+    profile_image_height = db.Column(db.Integer)
+    profile_image_color = db.Column(db.String(7))
+    profile_image_placeholder = db.Column(db.Text)
     email = db.Column(db.String(100), nullable=False)
     phone = db.Column(db.String(20))
     location = db.Column(db.String(100))
@@ -50,52 +132,122 @@ class Bio(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-class SocialLinks(db.Model):
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'about_me': self.about_me,
+            'tagline': self.tagline,
+            'profile_image': self.profile_image,
+            'profile_image_width': self.profile_image_width,
+            'profile_image_height': self.profile_image_height,
+            'profile_image_color': self.profile_image_color,
+            'email': self.email,
+            'phone': self.phone,
+            'location': self.location,
+            'resume_url': self.resume_url
+        }
+
+class SocialLinks(TenantScoped, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     platform = db.Column(db.String(50), nullable=False)
     url = db.Column(db.String(200), nullable=False)
     icon_class = db.Column(db.String(100))
     display_order = db.Column(db.Integer, default=0)
 
-class ContactSubmission(db.Model):
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'platform': self.platform,
+            'url': self.url,
+            'icon_class': self.icon_class,
+            'display_order': self.display_order
+        }
+
+class ContactSubmission(TenantScoped, db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100), nullable=False)
+    name = db.Column(db.String(100), nullable=False, index=True)
     email = db.Column(db.String(100), nullable=False)
     subject = db.Column(db.String(200))
     message = db.Column(db.Text, nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     read = db.Column(db.Boolean, default=False)
 
+    message_excerpt = query_expression()
+
+    # Serves both the unread count and the retention scan for old read messages
+    __table_args__ = (db.Index('ix_contact_submission_read_created_at', 'read', 'created_at'),)
+
+class ContactArchive(TenantScoped, db.Model):
+    """Cold storage for read messages moved out of the inbox by retention.py"""
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # same id as in the inbox
+    name = db.Column(db.String(100), nullable=False)
+    email = db.Column(db.String(100), nullable=False, index=True)
+    subject = db.Column(db.String(200))
+    message = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, index=True)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
     # Add these to your existing models in models.py
 
-class Certifications(db.Model):
+class Certifications(TenantScoped, db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    title = db.Column(db.String(100), nullable=False)
+    title = db.Column(db.String(100), nullable=False, index=True)
     issuing_organization = db.Column(db.String(100), nullable=False)
-    issue_date = db.Column(db.Date, nullable=False)
+    issue_date = db.Column(db.Date, nullable=False, index=True)
     expiry_date = db.Column(db.Date)
     credential_id = db.Column(db.String(100))
     credential_url = db.Column(db.String(200))
     image_url = db.Column(db.String(200))
+    image_width = db.Column(db.Integer)
+    image_height = db.Column(db.Integer)
+    image_color = db.Column(db.String(7))
+    image_placeholder = db.Column(db.Text)
     description = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-class ToolsTechnologies(db.Model):
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'title': self.title,
+            'issuing_organization': self.issuing_organization,
+            'issue_date': self.issue_date.isoformat() if self.issue_date else None,
+            'expiry_date': self.expiry_date.isoformat() if self.expiry_date else None,
+            'credential_id': self.credential_id,
+            'credential_url': self.credential_url,
+            'image_url': self.image_url,
+            'image_width': self.image_width,
+            'image_height': self.image_height,
+            'image_color': self.image_color,
+            'description': self.description
+        }
+
+class ToolsTechnologies(TenantScoped, db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(50), nullable=False)
+    name = db.Column(db.String(50), nullable=False, index=True)
     category = db.Column(db.String(50))
     icon_class = db.Column(db.String(100))
     proficiency_level = db.Column(db.Integer)  # 0-100
-    display_order = db.Column(db.Integer, default=0)
+    display_order = db.Column(db.Integer, default=0, index=True)
     is_featured = db.Column(db.Boolean, default=False)
 
-class Education(db.Model):
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'category': self.category,
+            'icon_class': self.icon_class,
+            'proficiency_level': self.proficiency_level,
+            'display_order': self.display_order,
+            'is_featured': self.is_featured
+        }
+
+class Education(TenantScoped, db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    degree = db.Column(db.String(100), nullable=False)
+    degree = db.Column(db.String(100), nullable=False, index=True)
     institution = db.Column(db.String(100), nullable=False)
     location = db.Column(db.String(100))
-    start_date = db.Column(db.Date, nullable=False)
+    start_date = db.Column(db.Date, nullable=False, index=True)
     end_date = db.Column(db.Date)
     current = db.Column(db.Boolean, default=False)
     description = db.Column(db.Text)
@@ -103,13 +255,38 @@ class Education(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-class LetsTalk(db.Model):
+    description_excerpt = query_expression()
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'degree': self.degree,
+            'institution': self.institution,
+            'location': self.location,
+            'start_date': self.start_date.isoformat() if self.start_date else None,
+            'end_date': self.end_date.isoformat() if self.end_date else None,
+            'current': self.current,
+            'description': self.description,
+            'grade': self.grade
+        }
+
+class LetsTalk(TenantScoped, db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    title = db.Column(db.String(100), nullable=False)
+    title = db.Column(db.String(100), nullable=False, index=True)
     description = db.Column(db.Text)
     contact_info = db.Column(db.String(200))
     icon_class = db.Column(db.String(100))
-    display_order = db.Column(db.Integer, default=0)
+    display_order = db.Column(db.Integer, default=0, index=True)
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'title': self.title,
+            'description': self.description,
+            'contact_info': self.contact_info,
+            'icon_class': self.icon_class,
+            'display_order': self.display_order
+        }
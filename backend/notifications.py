@@ -0,0 +1,238 @@
+"""Digest emails about new contact messages, sent from a background thread.
+
+Committed ContactSubmission rows are queued in memory; the worker wakes
+every MAIL_FLUSH_INTERVAL seconds (sooner once MAIL_BATCH_SIZE messages
+are waiting) and sends one digest per portfolio over a single SMTP
+connection. The connection is reused across flushes while messages keep
+coming, and closed once a flush interval passes with nothing to send.
+A failed flush keeps its messages and is retried with exponential
+backoff; after MAIL_MAX_RETRIES attempts the batch is dropped and logged.
+
+Nothing is set up unless MAIL_SERVER and MAIL_NOTIFY_TO are configured.
+"""
+import queue
+import smtplib
+import time
+from collections import defaultdict
+from email.message import EmailMessage
+from email.utils import make_msgid
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from models import db, ContactSubmission, Tenant
+from background import BackgroundThread
+
+PREVIEW_LENGTH = 500
+MAX_BACKOFF = 300  # seconds
+
+
+class SMTPConnection:
+    """One reusable SMTP connection, reopened when the server has dropped it"""
+
+    def __init__(self, host, port, username=None, password=None, use_tls=False, use_ssl=False, timeout=10):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.use_ssl = use_ssl
+        self.timeout = timeout
+        self._smtp = None
+
+    def _open(self):
+        smtp_class = smtplib.SMTP_SSL if self.use_ssl else smtplib.SMTP
+        smtp = smtp_class(self.host, self.port, timeout=self.timeout)
+        if self.use_tls:
+            smtp.starttls()
+        if self.username:
+            smtp.login(self.username, self.password)
+        return smtp
+
+    def _alive(self):
+        try:
+            return self._smtp.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def send(self, message):
+        if self._smtp is None or not self._alive():
+            self.close()
+            self._smtp = self._open()
+        try:
+            self._smtp.send_message(message)
+        except (smtplib.SMTPServerDisconnected, OSError):
+            # Dropped between the liveness check and the send: one fresh attempt
+            self.close()
+            self._smtp = self._open()
+            self._smtp.send_message(message)
+
+    def close(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._smtp = None
+
+
+class ContactNotifier(BackgroundThread):
+    name = 'contact-notifier'
+
+    def __init__(self, app, connection, sender, recipients, flush_interval=60, batch_size=50,
+                 max_retries=5, max_queue=1000):
+        super().__init__()
+        self.app = app
+        self.connection = connection
+        self.sender = sender
+        self.recipients = recipients
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.max_queue = max_queue
+        self.queue = queue.Queue(max_queue)
+
+    def after_fork(self):
+        self.queue = queue.Queue(self.max_queue)
+        self.connection._smtp = None  # the parent's socket isn't ours to use
+
+    def notify(self, message):
+        self.ensure_started()
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            self.app.logger.warning('Notification queue full, skipped message %s', message['id'])
+
+    def run(self):
+        pending = []
+        attempts = 0
+        next_flush = time.monotonic() + self.flush_interval
+        stop = False
+        while not stop:
+            try:
+                item = self.queue.get(timeout=max(next_flush - time.monotonic(), 0))
+                if item is None:
+                    stop = True
+                else:
+                    pending.append(item)
+                    if len(pending) < self.batch_size or attempts:
+                        continue
+            except queue.Empty:
+                pass
+
+            if pending:
+                try:
+                    self.flush(pending)
+                    pending, attempts = [], 0
+                except Exception:
+                    attempts += 1
+                    if attempts > self.max_retries or stop:
+                        self.app.logger.exception('Dropping %d contact notifications', len(pending))
+                        pending, attempts = [], 0
+                    else:
+                        delay = min(self.flush_interval * 2 ** (attempts - 1), MAX_BACKOFF)
+                        self.app.logger.warning('Sending contact notifications failed (attempt %d), '
+                                                'retrying in %ds', attempts, delay, exc_info=True)
+                        next_flush = time.monotonic() + delay
+                        continue
+            else:
+                # Idle: don't hold the server's connection slot until the next message
+                self.connection.close()
+            next_flush = time.monotonic() + self.flush_interval
+        self.connection.close()
+
+    def flush(self, messages):
+        by_tenant = defaultdict(list)
+        for message in messages:
+            by_tenant[message['tenant_id']].append(message)
+        sent = []
+        try:
+            for tenant_id, tenant_messages in by_tenant.items():
+                self.connection.send(self.digest(tenant_id, tenant_messages))
+                sent.append(tenant_id)
+        finally:
+            # Don't send the same digest twice when a later one fails
+            messages[:] = [m for m in messages if m['tenant_id'] not in sent]
+
+    def digest(self, tenant_id, messages):
+        site = None
+        if tenant_id is not None:
+            with self.app.app_context():
+                tenant = db.session.get(Tenant, tenant_id)
+                site = tenant.host if tenant else None
+
+        count = len(messages)
+        email = EmailMessage()
+        email['Subject'] = f'{count} new contact message{"s" if count != 1 else ""}' + \
+            (f' on {site}' if site else '')
+        email['From'] = self.sender
+        email['To'] = ', '.join(self.recipients)
+        email['Message-ID'] = make_msgid(domain=site)
+
+        parts = []
+        for message in messages:
+            text = message['message'] or ''
+            if len(text) > PREVIEW_LENGTH:
+                text = text[:PREVIEW_LENGTH] + '...'
+            parts.append(f'From: {message["name"]} <{message["email"]}>\n'
+                         f'Subject: {message["subject"] or "(none)"}\n'
+                         f'Received: {message["created_at"]} UTC\n\n{text}')
+        email.set_content('\n\n---\n\n'.join(parts) + '\n\nRead and reply from the admin panel under Messages.\n')
+        return email
+
+    def request_stop(self):
+        """Send what's queued; called at interpreter exit"""
+        try:
+            self.queue.put(None, timeout=self.stop_timeout)
+        except queue.Full:
+            pass
+
+
+def _app_notifier():
+    return current_app.extensions.get('contact_notifier') if has_app_context() else None
+
+
+# Registered once for all apps: messages go to the notifier of the app the commit ran under
+@event.listens_for(Session, 'after_flush')
+def _collect_new_messages(session, flush_context):
+    if _app_notifier() is None:
+        return
+    for obj in session.new:
+        if isinstance(obj, ContactSubmission):
+            session.info.setdefault('new_contact_messages', []).append({
+                'id': obj.id, 'tenant_id': obj.tenant_id, 'name': obj.name, 'email': obj.email,
+                'subject': obj.subject, 'message': obj.message,
+                'created_at': obj.created_at.strftime('%Y-%m-%d %H:%M') if obj.created_at else None,
+            })
+
+
+@event.listens_for(Session, 'after_commit')
+def _queue_notifications(session):
+    messages = session.info.pop('new_contact_messages', ())
+    notifier = _app_notifier()
+    if notifier is not None:
+        for message in messages:
+            notifier.notify(message)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_new_messages(session):
+    session.info.pop('new_contact_messages', None)
+
+
+def init_notifications(app):
+    recipients = [r.strip() for r in (app.config['MAIL_NOTIFY_TO'] or '').split(',') if r.strip()]
+    if not app.config['MAIL_SERVER'] or not recipients:
+        return None
+
+    connection = SMTPConnection(app.config['MAIL_SERVER'], app.config['MAIL_PORT'],
+                                username=app.config['MAIL_USERNAME'], password=app.config['MAIL_PASSWORD'],
+                                use_tls=app.config['MAIL_USE_TLS'], use_ssl=app.config['MAIL_USE_SSL'],
+                                timeout=app.config['MAIL_TIMEOUT'])
+    notifier = ContactNotifier(app, connection,
+                               sender=app.config['MAIL_DEFAULT_SENDER'] or recipients[0],
+                               recipients=recipients,
+                               flush_interval=app.config['MAIL_FLUSH_INTERVAL'],
+                               batch_size=app.config['MAIL_BATCH_SIZE'],
+                               max_retries=app.config['MAIL_MAX_RETRIES'])
+    app.extensions['contact_notifier'] = notifier
+    return notifier
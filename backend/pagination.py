@@ -0,0 +1,187 @@
+"""Keyset pagination and sorting for the admin lists.
+
+Pages are addressed by a cursor holding the sort value and id of the
+row they start after (or end before), so every page is one indexed
+range scan no matter how deep it is. Ties on the sort column are broken
+by id. Sort columns should be indexed. On nullable ones NULLs sort after
+every value (before them when descending), which costs the plain tuple
+comparison, so prefer non-null sort columns.
+
+A cursor that doesn't decode to a value of the sort column's type is
+answered with a 400.
+"""
+import base64
+import json
+from datetime import date, datetime
+from flask import request, abort
+from sqlalchemy import inspect, tuple_, and_, or_
+from models import db
+
+PER_PAGE_OPTIONS = (10, 25, 50, 100)
+DEFAULT_PER_PAGE = 25
+
+
+def encode_cursor(value, item_id):
+    if isinstance(value, (date, datetime)):
+        value = value.isoformat()
+    raw = json.dumps([value, item_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, column):
+    """Turn a cursor back into (sort value, id); None if it is malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        value, item_id = json.loads(raw)
+        if type(item_id) is not int:
+            return None
+        if value is None:
+            return (None, item_id) if column.expression.nullable else None
+        python_type = column.type.python_type
+        if python_type is datetime:
+            value = datetime.fromisoformat(value)
+        elif python_type is date:
+            value = date.fromisoformat(value)
+        elif python_type is float and type(value) is int:
+            value = float(value)
+        elif type(value) is not python_type:
+            # Only what encode_cursor could have written gets near the query
+            return None
+        return value, item_id
+    except (ValueError, TypeError, NotImplementedError):
+        return None
+
+
+def _after_cursor(column, id_column, cursor, descending):
+    """Rows that come after ``cursor`` in the list's order"""
+    value, item_id = cursor
+    if not column.expression.nullable:
+        key = tuple_(column, id_column)
+        return key < cursor if descending else key > cursor
+    # NULLs go last: a row-value comparison can't place them, so spell the order out
+    if descending:
+        if value is None:
+            return or_(column.isnot(None), id_column < item_id)
+        return or_(column < value, and_(column == value, id_column < item_id))
+    if value is None:
+        return and_(column.is_(None), id_column > item_id)
+    return or_(column > value, and_(column == value, id_column > item_id), column.is_(None))
+
+
+class KeysetPage:
+    per_page_options = PER_PAGE_OPTIONS
+
+    def __init__(self, query, items, sort, direction, per_page, sort_column, has_next, has_prev, params=None):
+        self.query = query
+        self.items = items
+        self.sort = sort
+        self.direction = direction
+        self.per_page = per_page
+        self.sort_column = sort_column
+        self.has_next = has_next
+        self.has_prev = has_prev
+        self.params = params or {}
+        self._total = None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    @property
+    def total(self):
+        """Row count over the whole (filtered) list, only queried if a template asks"""
+        if self._total is None:
+            self._total = self.query.order_by(None).count()
+        return self._total
+
+    def _cursor(self, item):
+        return encode_cursor(getattr(item, self.sort_column.key), item.id)
+
+    @property
+    def next_cursor(self):
+        return self._cursor(self.items[-1]) if self.has_next and self.items else None
+
+    @property
+    def prev_cursor(self):
+        return self._cursor(self.items[0]) if self.has_prev and self.items else None
+
+    def args(self, **overrides):
+        """Query args for a link from this page: same sort, page size, filters and position
+        unless overridden (pass ``after``/``before`` to move, ``sort`` to restart)."""
+        args = {**self.params, 'sort': self.sort, 'dir': self.direction, 'per_page': self.per_page}
+        if not {'after', 'before', 'sort', 'dir', 'per_page'} & overrides.keys():
+            args['after'] = request.args.get('after')
+            args['before'] = request.args.get('before')
+        args.update(overrides)
+        return {key: value for key, value in args.items() if value is not None}
+
+    def get(self, item_id):
+        for item in self.items:
+            if item.id == item_id:
+                return item
+        return None
+
+
+def paginate(query, model, sorts, default_sort, default_direction='desc', keep=()):
+    """Return one KeysetPage of ``query`` as chosen by the sort/dir/per_page/after/before args.
+
+    ``sorts`` maps the names accepted in ``?sort=`` to columns of ``model``;
+    request args named in ``keep`` (e.g. filters) are carried into page links.
+    """
+    sort = request.args.get('sort')
+    if sort not in sorts:
+        sort = default_sort
+    direction = request.args.get('dir')
+    if direction not in ('asc', 'desc'):
+        direction = default_direction
+    per_page = request.args.get('per_page', DEFAULT_PER_PAGE, type=int)
+    if per_page not in PER_PAGE_OPTIONS:
+        per_page = DEFAULT_PER_PAGE
+
+    column = sorts[sort]
+    after = request.args.get('after')
+    before = request.args.get('before')
+    cursor = None
+    if after or before:
+        cursor = decode_cursor(after or before, column)
+        if cursor is None:
+            abort(400)
+    # Walking backwards means reading the range in reverse order and flipping the result
+    backwards = cursor is not None and not after
+    descending = (direction == 'desc') != backwards
+
+    page_query = query
+    if cursor is not None:
+        page_query = page_query.filter(_after_cursor(column, model.id, cursor, descending))
+    order = column.desc() if descending else column.asc()
+    if column.expression.nullable:
+        order = order.nulls_first() if descending else order.nulls_last()
+    page_query = page_query.order_by(order, model.id.desc() if descending else model.id.asc())
+    rows = page_query.limit(per_page + 1).all()
+
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+        has_next, has_prev = True, more
+    else:
+        has_next, has_prev = more, cursor is not None
+    params = {name: request.args[name] for name in keep if request.args.get(name)}
+    return KeysetPage(query, rows, sort, direction, per_page, column, has_next, has_prev, params)
+
+
+def edit_item(page, model, item_id):
+    """The row opened for editing, reusing the page's copy when it's on this page.
+
+    List queries may load only some columns; whatever the edit form
+    needs beyond those is fetched in a single query.
+    """
+    item = page.get(item_id)
+    if item is None:
+        return db.session.get(model, item_id)
+    unloaded = inspect(item).unloaded
+    if unloaded:
+        db.session.refresh(item, attribute_names=list(unloaded))
+    return item
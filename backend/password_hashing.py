@@ -0,0 +1,60 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from werkzeug.security import generate_password_hash, check_password_hash
+from background import ProcessLocal
+
+
+class HasherBusy(Exception):
+    """Raised when the hashing pool and its queue are both full"""
+
+
+class PasswordHasher:
+    """Runs the deliberately slow Werkzeug hashing on a small, bounded pool.
+
+    At most ``max_workers`` hashes run at once and at most ``max_queue``
+    more wait for a slot; anything beyond that is rejected straight away
+    with HasherBusy, so a burst of logins cannot tie up every web worker.
+    """
+
+    def __init__(self, method='pbkdf2:sha256:600000', max_workers=2, max_queue=8, timeout=5.0):
+        self.method = method
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._executor = ProcessLocal(lambda: ThreadPoolExecutor(max_workers=self.max_workers,
+                                                                 thread_name_prefix='password-hash'))
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy()
+        try:
+            future = self._executor.get().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            raise HasherBusy()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        if not pwhash:
+            return False
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        # Werkzeug stores the full method string before the first '$'
+        return pwhash.split('$', 1)[0] != self.method
+
+
+def init_password_hasher(app):
+    hasher = PasswordHasher(method=app.config['PASSWORD_HASH_METHOD'],
+                            max_workers=app.config['PASSWORD_HASH_WORKERS'],
+                            max_queue=app.config['PASSWORD_HASH_QUEUE'],
+                            timeout=app.config['PASSWORD_HASH_TIMEOUT'])
+    app.extensions['password_hasher'] = hasher
+    return hasher
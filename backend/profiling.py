@@ -0,0 +1,321 @@
+"""Admin-toggled sampling profiler.
+
+While switched on, a sampled fraction of requests (optionally only one
+route) gets its thread's stack recorded every PROFILER_INTERVAL seconds
+by a background thread. Each finished profile is written in collapsed
+stack format (``frame;frame;frame count`` lines), which flamegraph.pl,
+speedscope and inferno read directly, next to a small JSON summary used
+by the admin page.
+
+Async views served natively by asgi.py all run on the event loop's
+thread, interleaved, so a sample of that thread can't be attributed to
+any one of them. Those requests are recorded with their timing only.
+
+Each portfolio has its own switch, kept in a JSON file so every worker
+process picks it up; it's re-read at most every PROFILER_SETTINGS_REFRESH
+seconds. When the profiler is off a request costs one cached dict lookup.
+"""
+import asyncio
+import itertools
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from flask import Blueprint, request, render_template, redirect, url_for, flash, current_app, g, abort, send_file
+from flask_login import login_required
+from tenancy import current_tenant_id
+from background import BackgroundThread
+
+profiler = Blueprint('profiler', __name__)
+
+DEFAULT_SETTINGS = {'enabled': False, 'sample_rate': 0.1, 'route': ''}
+
+
+class ProfilerSettings:
+    """The on/off switch, shared between workers through a JSON file"""
+
+    def __init__(self, path, refresh=1.0):
+        self.path = path
+        self.refresh = refresh
+        self._settings = dict(DEFAULT_SETTINGS)
+        self._checked_at = 0.0
+        self._mtime = None
+
+    def current(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.refresh:
+            return self._settings
+        self._checked_at = now
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            self._settings, self._mtime = dict(DEFAULT_SETTINGS), None
+            return self._settings
+        if mtime != self._mtime:
+            try:
+                with open(self.path) as f:
+                    self._settings = {**DEFAULT_SETTINGS, **json.load(f)}
+                self._mtime = mtime
+            except (OSError, ValueError):
+                pass  # half-written by another worker; keep the old settings and retry
+        return self._settings
+
+    def save(self, **settings):
+        settings = {**self.current(), **settings}
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(settings, f)
+        os.replace(tmp_path, self.path)
+        self._settings, self._checked_at = settings, time.monotonic()
+        self._mtime = os.stat(self.path).st_mtime
+        return settings
+
+
+class TenantProfilerSettings:
+    """A ProfilerSettings per tenant, so one portfolio's admin can't profile the others"""
+
+    def __init__(self, directory, refresh=1.0):
+        self.directory = directory
+        self.refresh = refresh
+        self._settings = {}
+
+    def for_tenant(self, tenant_id=None):
+        settings = self._settings.get(tenant_id)
+        if settings is None:
+            name = 'profiler.json' if tenant_id is None else f'profiler-t{tenant_id}.json'
+            settings = self._settings.setdefault(
+                tenant_id, ProfilerSettings(os.path.join(self.directory, name), self.refresh))
+        return settings
+
+
+def frame_label(code):
+    filename = code.co_filename
+    for prefix in sys.path:
+        if prefix and filename.startswith(prefix + os.sep):
+            filename = filename[len(prefix) + 1:]
+            break
+    return f'{code.co_name} ({filename}:{code.co_firstlineno})'
+
+
+class Sampler(BackgroundThread):
+    """Background thread sampling the stacks of the threads being profiled"""
+
+    name = 'request-profiler'
+
+    def __init__(self, interval=0.005):
+        super().__init__()
+        self.interval = interval
+        self._active = {}
+        self._tokens = itertools.count()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+
+    def after_fork(self):
+        self._active = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+
+    def track(self, thread_id):
+        """Start sampling ``thread_id``; returns the token that untrack() takes"""
+        self.ensure_started()
+        token = next(self._tokens)
+        with self._lock:
+            self._active[token] = (thread_id, Counter())
+        self._wake.set()
+        return token
+
+    def untrack(self, token):
+        """Stop sampling and return the stacks collected under ``token``"""
+        with self._lock:
+            entry = self._active.pop(token, None)
+        return entry[1] if entry else None
+
+    def request_stop(self):
+        self.stopping.set()
+        self._wake.set()
+
+    def run(self):
+        while not self.stopping.is_set():
+            self._wake.wait()
+            with self._lock:
+                active = dict(self._active)
+                if not active:
+                    self._wake.clear()
+                    continue
+            frames = sys._current_frames()
+            for thread_id, stacks in active.values():
+                frame = frames.get(thread_id)
+                labels = []
+                while frame is not None:
+                    labels.append(frame_label(frame.f_code))
+                    frame = frame.f_back
+                if labels:
+                    stacks[';'.join(reversed(labels))] += 1
+            time.sleep(self.interval)
+
+
+class ProfileStore:
+    """Finished profiles on disk: ``<id>.folded`` stacks plus ``<id>.json`` summary"""
+
+    def __init__(self, root, max_profiles=100):
+        self.root = root
+        self.max_profiles = max_profiles
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, profile_id, suffix):
+        if not profile_id.isalnum():
+            raise FileNotFoundError(profile_id)
+        return os.path.join(self.root, profile_id + suffix)
+
+    def save(self, summary, stacks):
+        profile_id = uuid.uuid4().hex
+        with open(self.path(profile_id, '.folded'), 'w') as f:
+            for stack, count in stacks.most_common():
+                f.write(f'{stack} {count}\n')
+        summary = {**summary, 'id': profile_id}
+        with open(self.path(profile_id, '.json'), 'w') as f:
+            json.dump(summary, f)
+        self.prune()
+        return summary
+
+    def summaries(self):
+        summaries = []
+        for entry in os.scandir(self.root):
+            if entry.name.endswith('.json'):
+                try:
+                    with open(entry.path) as f:
+                        summaries.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+        return sorted(summaries, key=lambda s: s['duration_ms'], reverse=True)
+
+    def prune(self):
+        for summary in self.summaries()[self.max_profiles:]:
+            self.delete(summary['id'])
+
+    def delete(self, profile_id):
+        for suffix in ('.folded', '.json'):
+            try:
+                os.remove(self.path(profile_id, suffix))
+            except FileNotFoundError:
+                pass
+
+
+def _should_profile(settings):
+    if not settings['enabled'] or request.endpoint in (None, 'static') or \
+            request.blueprint == 'profiler':
+        return False
+    route = settings['route']
+    if route and route not in (request.endpoint, request.path):
+        return False
+    return random.random() < settings['sample_rate']
+
+
+def _on_event_loop():
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def init_profiler(app):
+    root = app.config.get('PROFILER_DIR') or os.path.join(app.instance_path, 'profiles')
+    settings = TenantProfilerSettings(app.instance_path, refresh=app.config['PROFILER_SETTINGS_REFRESH'])
+    sampler = Sampler(interval=app.config['PROFILER_INTERVAL'])
+    store = ProfileStore(root, max_profiles=app.config['PROFILER_MAX_PROFILES'])
+    app.extensions['profiler'] = {'settings': settings, 'sampler': sampler, 'store': store}
+
+    @app.before_request
+    def start_profile():
+        if not _should_profile(settings.for_tenant(current_tenant_id()).current()):
+            return
+        token = None if _on_event_loop() else sampler.track(threading.get_ident())
+        g.profile = (token, time.perf_counter(), datetime.utcnow())
+
+    @app.after_request
+    def note_profile_status(response):
+        if 'profile' in g:
+            # Streamed bodies are produced after the request ends; their timing means nothing here
+            g.profile_status = None if response.is_streamed else response.status_code
+        return response
+
+    @app.teardown_request
+    def finish_profile(exc):
+        profile = g.pop('profile', None)
+        if profile is None:
+            return
+        token, started, started_at = profile
+        timing_only = token is None
+        stacks = Counter() if timing_only else sampler.untrack(token)
+        status = g.pop('profile_status', 500 if exc else None)
+        if not (stacks or timing_only) or status is None:
+            return
+        try:
+            store.save({'method': request.method, 'path': request.path, 'endpoint': request.endpoint,
+                        'status': status, 'duration_ms': round((time.perf_counter() - started) * 1000, 1),
+                        'samples': sum(stacks.values()), 'started_at': started_at.isoformat(timespec='seconds'),
+                        'tenant_id': current_tenant_id(), 'timing_only': timing_only}, stacks)
+        except OSError:
+            app.logger.exception('Could not save request profile')
+
+    app.register_blueprint(profiler)
+    return app.extensions['profiler']
+
+
+def _profiler():
+    return current_app.extensions['profiler']
+
+
+@profiler.route('/admin/profiler', methods=['GET', 'POST'])
+@login_required
+def manage_profiler():
+    tenant_id = current_tenant_id()
+    settings = _profiler()['settings'].for_tenant(tenant_id)
+    if request.method == 'POST':
+        try:
+            sample_rate = min(max(float(request.form.get('sample_rate', 0)) / 100, 0.0), 1.0)
+        except ValueError:
+            flash('Sample rate must be a number between 0 and 100', 'error')
+            return redirect(url_for('profiler.manage_profiler'))
+        settings.save(enabled='enabled' in request.form, sample_rate=sample_rate,
+                      route=request.form.get('route', '').strip())
+        flash('Profiler settings saved', 'success')
+        return redirect(url_for('profiler.manage_profiler'))
+
+    # Profiles are shared by all workers; each portfolio only sees its own requests
+    profiles = [s for s in _profiler()['store'].summaries() if s.get('tenant_id') == tenant_id]
+    return render_template('admin/profiler.html', settings=settings.current(), profiles=profiles)
+
+
+@profiler.route('/admin/profiler/<profile_id>.folded')
+@login_required
+def download_profile(profile_id):
+    store = _profiler()['store']
+    try:
+        with open(store.path(profile_id, '.json')) as f:
+            summary = json.load(f)
+    except (OSError, ValueError):
+        abort(404)
+    if summary.get('tenant_id') != current_tenant_id():
+        abort(404)
+    return send_file(store.path(profile_id, '.folded'), mimetype='text/plain',
+                     as_attachment=True, download_name=f'{summary["endpoint"]}-{profile_id[:8]}.folded')
+
+
+@profiler.route('/admin/profiler/clear', methods=['POST'])
+@login_required
+def clear_profiles():
+    store = _profiler()['store']
+    tenant_id = current_tenant_id()
+    for summary in store.summaries():
+        if summary.get('tenant_id') == tenant_id:
+            store.delete(summary['id'])
+    flash('Profiles cleared', 'success')
+    return redirect(url_for('profiler.manage_profiler'))
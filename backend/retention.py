@@ -0,0 +1,103 @@
+from collections import Counter
+from datetime import datetime, timedelta
+from sqlalchemy import select, insert, delete, or_
+from models import db, ContactSubmission, ContactArchive
+from events import broker
+from background import BackgroundThread
+
+ARCHIVE_COLUMNS = ('id', 'tenant_id', 'name', 'email', 'subject', 'message', 'created_at')
+
+
+def archive_read_messages(older_than_days, batch_size=500, max_batches=None):
+    """Move read messages older than ``older_than_days`` into ContactArchive.
+
+    Works in small batches, each in its own transaction, so the inbox is
+    never locked for long. Returns the number of messages archived.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    archived = 0
+    batches = 0
+
+    while max_batches is None or batches < max_batches:
+        rows_query = (select(ContactSubmission.id, ContactSubmission.tenant_id)
+                      .where(ContactSubmission.read.is_(True), ContactSubmission.created_at < cutoff)
+                      .order_by(ContactSubmission.id)
+                      .limit(batch_size)
+                      .with_for_update(skip_locked=True))
+        try:
+            rows = db.session.execute(rows_query).all()
+            ids = [row.id for row in rows]
+            if not ids:
+                db.session.rollback()
+                break
+
+            columns = [getattr(ContactSubmission, name) for name in ARCHIVE_COLUMNS]
+            db.session.execute(
+                insert(ContactArchive).from_select(ARCHIVE_COLUMNS, select(*columns).where(ContactSubmission.id.in_(ids)))
+            )
+            db.session.execute(delete(ContactSubmission).where(ContactSubmission.id.in_(ids)))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        # Core statements bypass the ORM hooks in events.py, so report the change here
+        for tenant_id, count in Counter(row.tenant_id for row in rows).items():
+            broker.publish('counts', {'total_messages': -count}, tenant_id)
+        archived += len(ids)
+        batches += 1
+
+    return archived
+
+
+def search_archive(term=None, limit=50, offset=0):
+    query = ContactArchive.query
+    if term:
+        pattern = f'%{term}%'
+        query = query.filter(or_(ContactArchive.name.ilike(pattern),
+                                 ContactArchive.email.ilike(pattern),
+                                 ContactArchive.subject.ilike(pattern),
+                                 ContactArchive.message.ilike(pattern)))
+    return query.order_by(ContactArchive.created_at.desc()).offset(offset).limit(limit).all()
+
+
+class RetentionWorker(BackgroundThread):
+    """Background thread running archive passes every RETENTION_INTERVAL seconds"""
+
+    name = 'contact-retention'
+
+    def __init__(self, app):
+        super().__init__()
+        self.app = app
+
+    def run(self):
+        config = self.app.config
+        while not self.stopping.wait(config['RETENTION_INTERVAL']):
+            with self.app.app_context():
+                try:
+                    archived = archive_read_messages(config['RETENTION_DAYS'],
+                                                     batch_size=config['RETENTION_BATCH_SIZE'],
+                                                     max_batches=config['RETENTION_MAX_BATCHES'])
+                    if archived:
+                        self.app.logger.info('Archived %d contact messages', archived)
+                except Exception:
+                    self.app.logger.exception('Contact message retention pass failed')
+
+
+def init_retention(app):
+    worker = RetentionWorker(app)
+    app.extensions['retention'] = worker
+
+    if app.config['RETENTION_ENABLED']:
+        @app.before_request
+        def start_retention_worker():
+            worker.ensure_started()
+
+    @app.cli.command('archive-messages')
+    def archive_messages_command():
+        """Archive read contact messages older than RETENTION_DAYS."""
+        archived = archive_read_messages(app.config['RETENTION_DAYS'],
+                                         batch_size=app.config['RETENTION_BATCH_SIZE'])
+        print(f'Archived {archived} messages')
+
+    return worker
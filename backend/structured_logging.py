@@ -0,0 +1,227 @@
+"""Structured JSON logging that stays off the request path.
+
+Request threads only put records on a bounded in-memory queue; a
+background listener drains it and appends each batch to the log file
+with a single write. When the queue is full records are dropped (and
+counted) rather than making a request wait on the disk.
+
+Every worker process appends to the same file. The file is opened with
+O_APPEND and each batch goes out in one write(), so lines from
+different workers never interleave. Rotation is left to logrotate (or
+similar): a worker reopens the file once it has been moved away, which
+no process could do safely for the others by itself.
+
+Every record logged while handling a request carries its request id,
+route and method, plus the time spent in the database so far. One
+access record per request adds the status and total latency.
+"""
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import time
+import uuid
+from datetime import datetime, timezone
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from background import BackgroundThread
+
+access_logger = logging.getLogger('portfolio.access')
+
+REQUEST_FIELDS = ('request_id', 'route', 'method', 'path', 'status', 'latency_ms', 'db_ms', 'db_queries', 'tenant_id')
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for field in REQUEST_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class RequestQueueHandler(logging.handlers.QueueHandler):
+    """Enqueue records with the request fields captured in the calling thread"""
+
+    def __init__(self, listener):
+        # No queue of our own: the listener replaces its queue after a fork
+        super().__init__(None)
+        self.listener = listener
+
+    def prepare(self, record):
+        if has_request_context():
+            record.request_id = g.get('request_id')
+            record.route = request.endpoint
+            record.method = request.method
+            record.path = request.path
+            record.tenant_id = g.get('tenant_id')
+            if record.name != access_logger.name:
+                record.db_ms = round(g.get('db_time', 0.0) * 1000, 2)
+        # Render the message and traceback now: args and frames may not outlive the request
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        self.listener.ensure_started()
+        try:
+            self.listener.queue.put_nowait(record)
+        except queue.Full:
+            self.listener.dropped += 1
+
+
+class BatchingWatchedFileHandler(logging.handlers.WatchedFileHandler):
+    def _open(self):
+        # Unbuffered, so a batch reaches the file as a single write() rather than in buffer-sized pieces
+        return open(self.baseFilename, 'ab', buffering=0)
+
+    def emit(self, record):
+        self.emit_batch([record])
+
+    def emit_batch(self, records):
+        self.acquire()
+        try:
+            self.reopenIfNeeded()
+            if self.stream is None:
+                self.stream = self._open()
+                self._statstream()
+            data = ''.join(self.format(record) + self.terminator for record in records)
+            self.stream.write(data.encode(self.encoding or 'utf-8'))
+        except Exception:
+            self.handleError(records[-1])
+        finally:
+            self.release()
+
+
+class LogListener(BackgroundThread):
+    """Drains the log queue in batches of up to ``batch_size`` records.
+
+    A batch is written once it is full or ``flush_interval`` seconds
+    after its first record arrived.
+    """
+
+    name = 'log-writer'
+    stop_timeout = 2.0
+
+    def __init__(self, handler, maxsize=10000, batch_size=256, flush_interval=1.0):
+        super().__init__()
+        self.handler = handler
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize)
+        self.dropped = 0
+
+    def after_fork(self):
+        # The parent's listener thread didn't come along, nor should its backlog
+        self.queue = queue.Queue(self.maxsize)
+
+    def run(self):
+        q = self.queue
+        while True:
+            record = q.get()
+            if record is None:
+                return
+            batch = [record]
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    record = q.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if record is None:
+                    stop = True
+                    break
+                batch.append(record)
+            if self.dropped:
+                dropped, self.dropped = self.dropped, 0
+                batch.append(logging.makeLogRecord({'name': __name__, 'levelno': logging.WARNING,
+                                                    'levelname': 'WARNING',
+                                                    'msg': f'Log queue full, dropped {dropped} records'}))
+            self.handler.emit_batch(batch)
+            if stop:
+                return
+
+    def request_stop(self):
+        try:
+            self.queue.put(None, timeout=self.stop_timeout)
+        except queue.Full:
+            pass
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _stop_query_timer(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('query_started')
+    if started and has_request_context():
+        g.db_time = g.get('db_time', 0.0) + time.perf_counter() - started.pop()
+        g.db_queries = g.get('db_queries', 0) + 1
+
+
+@event.listens_for(Engine, 'handle_error')
+def _stop_failed_query_timer(context):
+    # A failed statement never reaches after_cursor_execute; count it here instead
+    conn = context.connection
+    if conn is not None:
+        _stop_query_timer(conn, None, None, None, None, False)
+
+
+def init_logging(app):
+    path = app.config.get('LOG_FILE') or os.path.join(app.instance_path, 'logs', 'portfolio.log')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    file_handler = BatchingWatchedFileHandler(path, delay=True)
+    file_handler.setFormatter(JsonFormatter())
+    listener = LogListener(file_handler, maxsize=app.config['LOG_QUEUE_SIZE'],
+                           batch_size=app.config['LOG_BATCH_SIZE'],
+                           flush_interval=app.config['LOG_FLUSH_INTERVAL'])
+    handler = RequestQueueHandler(listener)
+    app.extensions['log_listener'] = listener
+
+    for logger in (app.logger, access_logger):
+        # A second app in the same process replaces the first one's handler
+        for old in [h for h in logger.handlers if isinstance(h, RequestQueueHandler)]:
+            logger.removeHandler(old)
+        logger.addHandler(handler)
+    app.logger.setLevel(app.config['LOG_LEVEL'])
+    access_logger.setLevel(logging.INFO)
+    access_logger.propagate = False
+
+    @app.before_request
+    def start_request_log():
+        g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def write_access_log(response):
+        started = g.get('request_started')
+        if started is None:
+            return response
+        response.headers.setdefault('X-Request-ID', g.request_id)
+        access_logger.info('%s %s %s', request.method, request.path, response.status_code, extra={
+            'status': response.status_code,
+            'latency_ms': round((time.perf_counter() - started) * 1000, 2),
+            'db_ms': round(g.get('db_time', 0.0) * 1000, 2),
+            'db_queries': g.get('db_queries', 0),
+        })
+        return response
+
+    return listener
@@ -0,0 +1,97 @@
+import threading
+import time
+import click
+from flask import g, has_request_context, request, abort
+from sqlalchemy import event
+from sqlalchemy.orm import Session, with_loader_criteria
+from models import db, Tenant, TenantScoped, Admin
+
+
+def current_tenant_id():
+    """Tenant of the current request, or None in single-tenant mode and outside requests"""
+    if has_request_context():
+        return g.get('tenant_id')
+    return None
+
+
+class TenantResolver:
+    """Host header -> tenant id, cached so resolving costs no query on most requests"""
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, host):
+        host = host.split(':', 1)[0].lower()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._hosts.get(host)
+        if entry and entry[1] > now:
+            return entry[0]
+
+        tenant = Tenant.query.filter_by(host=host).first()
+        tenant_id = tenant.id if tenant else None
+        with self._lock:
+            self._hosts[host] = (tenant_id, now + self.ttl)
+        return tenant_id
+
+    def forget(self, host=None):
+        with self._lock:
+            if host is None:
+                self._hosts.clear()
+            else:
+                self._hosts.pop(host.lower(), None)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _scope_to_tenant(orm_execute_state):
+    tenant_id = current_tenant_id()
+    if tenant_id is None or orm_execute_state.execution_options.get('all_tenants'):
+        return
+    if orm_execute_state.is_select or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.statement = orm_execute_state.statement.options(
+            with_loader_criteria(TenantScoped, lambda cls: cls.tenant_id == tenant_id, include_aliases=True)
+        )
+
+
+@event.listens_for(Session, 'before_flush')
+def _assign_tenant(session, flush_context, instances):
+    tenant_id = current_tenant_id()
+    if tenant_id is None:
+        return
+    for obj in session.new:
+        if isinstance(obj, TenantScoped) and obj.tenant_id is None:
+            obj.tenant_id = tenant_id
+
+
+def init_tenancy(app):
+    if not app.config['MULTI_TENANT']:
+        return None
+
+    resolver = TenantResolver(ttl=app.config['TENANT_CACHE_TTL'])
+    app.extensions['tenant_resolver'] = resolver
+
+    @app.before_request
+    def resolve_tenant():
+        g.tenant_id = resolver.resolve(request.host)
+        if g.tenant_id is None:
+            abort(404)
+
+    @app.cli.command('create-tenant')
+    @click.argument('host')
+    @click.argument('name')
+    @click.option('--admin-username', default='admin')
+    @click.option('--admin-password', prompt=True, hide_input=True, confirmation_prompt=True)
+    def create_tenant_command(host, name, admin_username, admin_password):
+        """Add a portfolio served at HOST, with its own admin account."""
+        tenant = Tenant(host=host.lower(), name=name)
+        db.session.add(tenant)
+        db.session.flush()
+        admin = Admin(username=admin_username, tenant_id=tenant.id)
+        admin.set_password(admin_password)
+        db.session.add(admin)
+        db.session.commit()
+        print(f"Tenant {tenant.id} created for {tenant.host} with admin '{admin_username}'")
+
+    return resolver
@@ -0,0 +1,91 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# asgi.py builds an app when imported; give it the test settings and keep its files out of the tree
+_scratch = tempfile.mkdtemp(prefix='portfolio-tests-')
+os.environ.setdefault('FLASK_CONFIG', 'testing')
+os.environ.setdefault('LOG_FILE', os.path.join(_scratch, 'portfolio.log'))
+os.environ.setdefault('PROFILER_DIR', os.path.join(_scratch, 'profiles'))
+os.environ.setdefault('UPLOAD_PARTIAL_DIR', os.path.join(_scratch, 'partial-uploads'))
+os.environ.setdefault('SESSION_REVOCATION_DIR', os.path.join(_scratch, 'revoked-sessions'))
+
+from app import create_app  # noqa: E402
+from models import db, Admin, Tenant  # noqa: E402
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """Build an app on a fresh SQLite file; keyword arguments override config values"""
+    apps = []
+
+    def make(**overrides):
+        test_config = {
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "portfolio.db"}',
+            'LOG_FILE': str(tmp_path / 'logs' / 'portfolio.log'),
+            'PROFILER_DIR': str(tmp_path / 'profiles'),
+            'UPLOAD_PARTIAL_DIR': str(tmp_path / 'partial-uploads'),
+            'SESSION_REVOCATION_DIR': str(tmp_path / 'revoked-sessions'),
+            **overrides,
+        }
+        app = create_app('testing', test_config=test_config, instance_path=str(tmp_path / 'instance'))
+        with app.app_context():
+            db.create_all()
+        apps.append(app)
+        return app
+
+    yield make
+    for app in apps:
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def tenant_app(make_app):
+    """A multi-tenant app with two portfolios; ``app.tenant_ids`` maps their hosts to ids"""
+    app = make_app(MULTI_TENANT=True)
+    app.tenant_ids = {host: add_tenant(app, host) for host in ('ada.example.com', 'grace.example.com')}
+    return app
+
+
+def add_admin(app, username='admin', password='secret', tenant_id=None):
+    with app.app_context():
+        admin = Admin(username=username, tenant_id=tenant_id)
+        admin.set_password(password)
+        db.session.add(admin)
+        db.session.commit()
+        return admin.id
+
+
+def add_tenant(app, host, name=None):
+    with app.app_context():
+        tenant = Tenant(host=host, name=name or host)
+        db.session.add(tenant)
+        db.session.commit()
+        return tenant.id
+
+
+def login(client, username='admin', password='secret', **kwargs):
+    return client.post('/admin/login', data={'username': username, 'password': password}, **kwargs)
+
+
+@pytest.fixture
+def admin_client(app, client):
+    add_admin(app)
+    assert login(client).status_code == 302
+    return client
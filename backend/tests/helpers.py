@@ -0,0 +1,32 @@
+import os
+
+from flask.testing import FlaskClient
+
+
+def in_child(fn):
+    """Run ``fn`` in a forked child process and return its exit status (0 when it returns True)"""
+    pid = os.fork()
+    if pid == 0:
+        try:
+            ok = fn()
+        except BaseException:
+            ok = False
+        os._exit(0 if ok else 1)
+    _, status = os.waitpid(pid, 0)
+    return os.waitstatus_to_exitcode(status)
+
+
+class HostClient(FlaskClient):
+    """A test client whose requests all go to one Host"""
+
+    def __init__(self, *args, host, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.host = host
+
+    def open(self, *args, **kwargs):
+        kwargs.setdefault('base_url', f'http://{self.host}')
+        return super().open(*args, **kwargs)
+
+
+def client_for(app, host):
+    return HostClient(app, app.response_class, use_cookies=True, host=host)
@@ -0,0 +1,89 @@
+import pytest
+
+from analytics import project_summary
+from helpers import client_for
+from models import db, Projects, ProjectStats
+
+
+def add_project(app, title, featured=True, tenant_id=None):
+    with app.app_context():
+        project = Projects(title=title, description='About ' + title, featured=featured, tenant_id=tenant_id)
+        db.session.add(project)
+        db.session.commit()
+        return project.id
+
+
+def stats(app):
+    app.extensions['project_analytics'].flush()
+    with app.app_context():
+        return {row.project_id: (row.views, row.demo_clicks, row.code_clicks) for row in ProjectStats.query}
+
+
+@pytest.fixture
+def analytics(app):
+    yield app.extensions['project_analytics']
+    app.extensions['project_analytics'].stop()
+
+
+def test_views_and_clicks_are_written_behind(app, client, analytics):
+    engine = add_project(app, 'Engine')
+    client.get('/')
+    client.get('/')
+    assert client.post('/api/track', json={'project_id': engine, 'target': 'demo'}).status_code == 204
+    assert client.post('/api/track', json={'project_id': engine, 'target': 'code'}).status_code == 204
+    assert stats(app) == {engine: (2, 1, 1)}
+
+    client.get('/')
+    assert stats(app) == {engine: (3, 1, 1)}
+    with app.app_context():
+        summary = project_summary(days=7)
+    assert (summary['views'], summary['clicks']) == (3, 2)
+    assert [(row.title, row.views) for row in summary['projects']] == [('Engine', 3)]
+
+
+@pytest.mark.parametrize('payload', [
+    {'project_id': '1', 'target': 'demo'},
+    {'project_id': 1, 'target': 'elsewhere'},
+    ['project_id', 1],
+])
+def test_malformed_clicks_are_bad_requests(app, client, analytics, payload):
+    add_project(app, 'Engine')
+    assert client.post('/api/track', json=payload).status_code == 400
+
+
+def test_only_published_projects_are_counted(app, client, analytics):
+    draft = add_project(app, 'Draft', featured=False)
+    assert client.post('/api/track', json={'project_id': draft, 'target': 'demo'}).status_code == 400
+    assert client.post('/api/track', json={'project_id': 99999, 'target': 'demo'}).status_code == 400
+    assert analytics._counts == {}
+
+    # Publishing the project invalidates the cached ids
+    with app.app_context():
+        db.session.get(Projects, draft).featured = True
+        db.session.commit()
+    assert client.post('/api/track', json={'project_id': draft, 'target': 'demo'}).status_code == 204
+    assert stats(app) == {draft: (0, 1, 0)}
+
+
+def test_clicks_only_count_for_the_tenants_own_projects(tenant_app):
+    ada, grace = tenant_app.tenant_ids['ada.example.com'], tenant_app.tenant_ids['grace.example.com']
+    analytics = tenant_app.extensions['project_analytics']
+    engine = add_project(tenant_app, 'Engine', tenant_id=ada)
+    compiler = add_project(tenant_app, 'Compiler', tenant_id=grace)
+
+    client = client_for(tenant_app, 'ada.example.com')
+    assert client.post('/api/track', json={'project_id': compiler, 'target': 'demo'}).status_code == 400
+    assert client.post('/api/track', json={'project_id': engine, 'target': 'demo'}).status_code == 204
+    assert stats(tenant_app) == {engine: (0, 1, 0)}
+    analytics.stop()
+
+
+def test_buffer_is_capped(make_app):
+    app = make_app(ANALYTICS_MAX_KEYS=1)
+    analytics = app.extensions['project_analytics']
+    first, second = add_project(app, 'Engine'), add_project(app, 'Loom')
+    with app.test_request_context():
+        analytics.record_views([first, second])
+    assert analytics.dropped == 1
+    assert stats(app) == {first: (1, 0, 0)}
+    analytics.stop()
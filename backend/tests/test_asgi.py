@@ -0,0 +1,80 @@
+import asyncio
+import threading
+
+import httpx
+import pytest
+
+from asgi import PortfolioASGI, build_environ
+
+
+def http_scope(method, path, headers=()):
+    return {'type': 'http', 'method': method, 'path': path, 'query_string': b'',
+            'http_version': '1.1', 'headers': list(headers)}
+
+
+async def request(asgi_app, *requests):
+    transport = httpx.ASGITransport(app=asgi_app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://localhost') as client:
+        return await asyncio.gather(*(client.request(method, url) for method, url in requests))
+
+
+@pytest.mark.parametrize('headers', [
+    [(b'content-type', b'application/x-www-form-urlencoded'), (b'content-length', b'5')],
+    [(b'content-type', b'application/x-www-form-urlencoded')],
+])
+def test_form_is_read_to_the_end_of_the_buffered_body(app, headers):
+    body = b'name=Ada&email=ada%40example.com'
+    environ = build_environ(http_scope('POST', '/contact', headers), body)
+
+    assert environ['CONTENT_LENGTH'] == str(len(body))
+    form = app.request_class(environ).form
+    assert form['name'] == 'Ada'
+    assert form['email'] == 'ada@example.com'
+
+
+def test_unhandled_error_in_async_view_gets_the_500_handler(make_app):
+    app = make_app(PROPAGATE_EXCEPTIONS=False)
+    handled = []
+
+    @app.errorhandler(500)
+    def server_error(e):
+        handled.append(e.original_exception)
+        return 'custom error page', 500
+
+    asgi_app = PortfolioASGI(app)
+
+    async def broken():
+        raise RuntimeError('boom')
+
+    asgi_app.routes[('GET', '/api/projects')] = broken
+    response, = asyncio.run(request(asgi_app, ('GET', '/api/projects')))
+
+    assert response.status_code == 500
+    assert response.text == 'custom error page'
+    assert isinstance(handled[0], RuntimeError)
+
+
+def test_sync_fallback_requests_run_concurrently(make_app):
+    app = make_app(ASGI_WSGI_THREADS=2)
+    released = threading.Event()
+
+    @app.route('/slow')
+    def slow():
+        return 'released' if released.wait(5) else 'timed out'
+
+    @app.route('/fast')
+    def fast():
+        released.set()
+        return 'ok'
+
+    async def slow_then_fast(asgi_app):
+        transport = httpx.ASGITransport(app=asgi_app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://localhost') as client:
+            slow_request = asyncio.ensure_future(client.get('/slow'))
+            await asyncio.sleep(0.1)
+            return await asyncio.gather(slow_request, client.get('/fast'))
+
+    slow_response, fast_response = asyncio.run(slow_then_fast(PortfolioASGI(app)))
+
+    assert fast_response.text == 'ok'
+    assert slow_response.text == 'released'
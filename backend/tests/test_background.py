@@ -0,0 +1,64 @@
+import os
+import threading
+
+import pytest
+
+from background import ProcessLocal, BackgroundThread
+from helpers import in_child
+
+pytestmark = pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs fork()')
+
+
+class Counter(BackgroundThread):
+    name = 'test-counter'
+
+    def __init__(self):
+        super().__init__()
+        self.items = []
+        self.finished = threading.Event()
+
+    def after_fork(self):
+        self.items = []
+
+    def run(self):
+        self.stopping.wait()
+        self.finished.set()
+
+
+def test_process_local_builds_once_per_process():
+    built = []
+    local = ProcessLocal(lambda: built.append(os.getpid()) or object())
+    value = local.get()
+    assert local.get() is value
+    assert local.peek() is value
+
+    def child():
+        return local.peek() is None and local.get() is not value and built[-1] == os.getpid()
+
+    assert in_child(child) == 0
+    assert built == [os.getpid()]
+
+
+def test_background_thread_restarts_in_forked_child():
+    worker = Counter()
+    assert not worker.running
+    worker.ensure_started()
+    worker.ensure_started()
+    assert worker.running
+    assert len([t for t in threading.enumerate() if t.name == 'test-counter']) >= 1
+    worker.items.append('parent')
+
+    def child():
+        if worker.running or worker.items:
+            return False
+        worker.ensure_started()
+        return worker.running
+
+    assert in_child(child) == 0
+    worker.stop()
+    assert worker.finished.is_set()
+    assert not worker.running
+
+
+def test_stop_without_start_is_a_no_op():
+    Counter().stop(timeout=0)
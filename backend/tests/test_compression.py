@@ -0,0 +1,47 @@
+import gzip
+
+from compression import CompressedVariants
+from models import db, Skills
+
+
+def add_skills(app, count):
+    with app.app_context():
+        for i in range(count):
+            db.session.add(Skills(skill_name=f'Skill number {i}', proficiency_level=50, display_order=i))
+        db.session.commit()
+
+
+def test_large_json_is_gzipped_and_keeps_a_weak_etag(app, client):
+    add_skills(app, 30)
+    plain = client.get('/api/portfolio?fields=skills')
+    response = client.get('/api/portfolio?fields=skills', headers={'Accept-Encoding': 'gzip'})
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert gzip.decompress(response.data) == plain.data
+    assert response.headers['ETag'] == 'W/' + plain.headers['ETag']
+    assert len(app.extensions['compressed_variants']._entries) == 1
+
+
+def test_small_or_unaccepted_responses_are_left_alone(app, client):
+    response = client.get('/api/portfolio?fields=bio', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+    assert 'Accept-Encoding' in response.headers['Vary']
+
+    add_skills(app, 30)
+    response = client.get('/api/portfolio?fields=skills', headers={'Accept-Encoding': 'identity'})
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_compressed_variants_are_bounded_by_bytes():
+    variants = CompressedVariants(max_bytes=10)
+    variants.set('a', b'12345')
+    variants.set('b', b'12345')
+    variants.get('a')
+    variants.set('c', b'123')
+    variants.set('huge', b'x' * 11)
+
+    assert variants.get('b') is None
+    assert variants.get('a') == b'12345'
+    assert variants.get('c') == b'123'
+    assert variants.get('huge') is None
@@ -0,0 +1,70 @@
+import pytest
+
+from contact_filter import ContactFilter, RollingFingerprints
+from models import db, ContactSubmission
+
+MESSAGE = {'name': 'Ada', 'email': 'ada@example.com', 'subject': 'Hi', 'message': 'Loved the engine project'}
+
+
+def stored(app):
+    with app.app_context():
+        return ContactSubmission.query.count()
+
+
+@pytest.mark.parametrize('changes, reason', [
+    ({'website': 'http://spam.example'}, 'honeypot'),
+    ({'email': 'not-an-email'}, 'invalid email'),
+    ({'message': 'x'}, 'message length'),
+    ({'message': '<a href="http://x.example">cheap</a>'}, 'markup'),
+    ({'message': 'http://a.example http://b.example http://c.example http://d.example'}, 'too many links'),
+])
+def test_spam_reasons(changes, reason):
+    assert ContactFilter().spam_reason({**MESSAGE, **changes}) == reason
+
+
+def test_resubmissions_are_caught_after_normalizing():
+    contact_filter = ContactFilter()
+    reason, key = contact_filter.check(MESSAGE)
+    assert reason is None and key is not None
+
+    again = {**MESSAGE, 'email': ' ADA@example.com', 'message': 'Loved  the\nengine project '}
+    assert contact_filter.check(again) == ('duplicate', None)
+    # The same message to another portfolio is not a duplicate
+    assert contact_filter.check(again, tenant_id=2)[0] is None
+
+    contact_filter.forget(key)
+    assert contact_filter.check(MESSAGE)[0] is None
+
+
+def test_fingerprints_live_one_to_two_windows(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('contact_filter.time.monotonic', lambda: now[0])
+    seen = RollingFingerprints(window=60)
+    seen.add('a')
+    now[0] += 61
+    assert not seen.add('a')  # still in the previous generation
+    now[0] += 122
+    assert seen.add('a')
+
+
+def test_contact_view_rejects_before_storing(app, client):
+    assert client.post('/contact', data=MESSAGE).json['success']
+    assert stored(app) == 1
+
+    # Duplicates and honeypot hits get the normal reply but nothing is written
+    assert client.post('/contact', data=MESSAGE).json['success']
+    assert client.post('/contact', data={**MESSAGE, 'message': 'Another one', 'website': 'x'}).json['success']
+    assert not client.post('/contact', data={**MESSAGE, 'email': 'nope'}).json['success']
+    assert stored(app) == 1
+
+
+def test_failed_save_lets_the_sender_retry(app, client, monkeypatch):
+    def broken_commit():
+        raise RuntimeError('database is down')
+
+    monkeypatch.setattr(db.session, 'commit', broken_commit)
+    assert not client.post('/contact', data=MESSAGE).json['success']
+    monkeypatch.undo()
+
+    assert client.post('/contact', data=MESSAGE).json['success']
+    assert stored(app) == 1
@@ -0,0 +1,126 @@
+import asyncio
+
+import httpx
+import pytest
+
+from asgi import PortfolioASGI
+from events import broker, EventBroker
+from models import db, ContactSubmission
+from conftest import add_admin, login
+
+
+def add_message(app, name='Ada'):
+    with app.app_context():
+        db.session.add(ContactSubmission(name=name, email='ada@example.com', message='Hello'))
+        db.session.commit()
+
+
+@pytest.fixture
+def stream_app(make_app):
+    return make_app(SSE_KEEPALIVE=0.05, SSE_MAX_AGE=0.3, SSE_WSGI=True)
+
+
+def test_broker_flags_and_drops_slow_subscribers():
+    events = EventBroker(max_queue=1)
+    subscription = events.subscribe()
+    events.publish('counts', {'total_messages': 1})
+    events.publish('counts', {'total_messages': 1})
+
+    assert subscription.overflowed
+    assert subscription not in events._subscribers
+
+
+def test_async_subscription_receives_events_from_other_threads():
+    async def run():
+        events = EventBroker(max_queue=1)
+        subscription = events.subscribe_async()
+        await asyncio.to_thread(events.publish, 'counts', {'total_messages': 1})
+        await asyncio.to_thread(events.publish, 'counts', {'total_messages': 2})
+        return subscription, await asyncio.wait_for(subscription.get(), 1)
+
+    subscription, event = asyncio.run(run())
+    assert event == ('counts', {'total_messages': 1})
+    assert subscription.overflowed
+
+
+def test_event_stream_requires_login(stream_app):
+    response = stream_app.test_client().get('/admin/events')
+    assert response.status_code == 302
+
+
+def test_wsgi_streams_are_off_by_default(admin_client):
+    assert admin_client.get('/admin/events').status_code == 204
+    # Only the dashboard opens a stream
+    assert b'data-events-url' in admin_client.get('/admin/dashboard').data
+    assert b'data-events-url' not in admin_client.get('/admin/projects').data
+
+
+def test_sync_event_stream_sends_snapshot_then_changes(stream_app):
+    add_admin(stream_app)
+    client = stream_app.test_client()
+    login(client)
+    add_message(stream_app, 'Before')
+
+    response = client.get('/admin/events', buffered=False)
+    add_message(stream_app, 'After')
+    body = response.get_data(as_text=True)
+
+    assert response.mimetype == 'text/event-stream'
+    assert body.startswith('retry: 3000\nevent: stats\n')
+    assert '"total_messages": 1' in body
+    assert 'event: new_message' in body and '"After"' in body
+    assert ': keepalive' in body
+
+
+def test_async_event_stream_is_served_natively(stream_app):
+    stream_app.config.update(SSE_MAX_AGE=5, SSE_WSGI=False)
+    add_admin(stream_app)
+    client = stream_app.test_client()
+    login(client)
+    cookie = f'session={client.get_cookie("session").value}'.encode()
+    asgi_app = PortfolioASGI(stream_app)
+
+    async def run():
+        chunks = asyncio.Queue()
+        disconnect = asyncio.Event()
+        requests = iter([{'type': 'http.request', 'body': b''}])
+
+        async def receive():
+            message = next(requests, None)
+            if message is None:
+                await disconnect.wait()
+                message = {'type': 'http.disconnect'}
+            return message
+
+        async def send(message):
+            await chunks.put(message)
+
+        scope = {'type': 'http', 'method': 'GET', 'path': '/admin/events', 'query_string': b'',
+                 'http_version': '1.1', 'headers': [(b'cookie', cookie)]}
+        call = asyncio.ensure_future(asgi_app(scope, receive, send))
+        start = await asyncio.wait_for(chunks.get(), 5)
+        snapshot = (await asyncio.wait_for(chunks.get(), 5))['body'].decode()
+
+        # The thread pool stays free for other admin pages while the stream is open
+        transport = httpx.ASGITransport(app=asgi_app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://localhost') as other:
+            dashboard = await asyncio.wait_for(other.get('/admin/dashboard', headers={'cookie': cookie.decode()}), 5)
+        assert dashboard.status_code == 200
+
+        await asyncio.to_thread(add_message, stream_app, 'Live')
+        while True:
+            message = await asyncio.wait_for(chunks.get(), 5)
+            if b'new_message' in message['body']:
+                break
+        disconnect.set()
+        await asyncio.wait_for(call, 5)
+        return start, snapshot, message
+
+    start, snapshot, message = asyncio.run(run())
+
+    assert start['status'] == 200
+    assert (b'content-type', b'text/event-stream; charset=utf-8') in start['headers']
+    assert snapshot.startswith('retry: 3000\nevent: stats\n')
+    assert '"total_messages": 0' in snapshot
+    assert b'"Live"' in message['body']
+    assert not broker._subscribers
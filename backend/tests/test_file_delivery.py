@@ -0,0 +1,78 @@
+import hashlib
+import os
+
+import pytest
+
+from file_delivery import IMMUTABLE_MAX_AGE
+
+DATA = bytes(range(256)) * 16
+DIGEST = hashlib.sha256(DATA).hexdigest()[:12]
+
+
+@pytest.fixture
+def static(tmp_path):
+    return str(tmp_path / 'static')
+
+
+def serve(make_app, static, **config):
+    app = make_app(**config)
+    app.static_folder = static
+    return app.test_client()
+
+
+def write(static, path):
+    path = os.path.join(static, path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(DATA)
+
+
+@pytest.mark.parametrize('path, immutable', [
+    (f'uploads/projects/logo_{DIGEST}.png', True),
+    (f'uploads/t3/projects/logo_{DIGEST}.png', True),
+    # Form uploads are only timestamped, so the name may be reused for other bytes
+    ('uploads/projects/logo_20240501_120000.png', False),
+    (f'css/logo_{DIGEST}.css', False),
+])
+def test_only_content_named_uploads_are_immutable(make_app, static, path, immutable):
+    write(static, path)
+    response = serve(make_app, static).get('/static/' + path)
+
+    assert response.status_code == 200 and response.data == DATA
+    assert response.cache_control.immutable is immutable
+    assert (response.cache_control.max_age == IMMUTABLE_MAX_AGE) is immutable
+
+
+def test_range_requests(make_app, static):
+    write(static, 'resume.pdf')
+    response = serve(make_app, static).get('/static/resume.pdf', headers={'Range': 'bytes=100-199'})
+    assert response.status_code == 206
+    assert response.data == DATA[100:200]
+
+
+@pytest.mark.parametrize('mode, header, value', [
+    ('x-accel-redirect', 'X-Accel-Redirect', '/_static/uploads/projects/my%20logo.png'),
+    ('x-sendfile', 'X-Sendfile', None),
+])
+def test_proxy_delivery(make_app, static, mode, header, value):
+    write(static, 'uploads/projects/my logo.png')
+    client = serve(make_app, static, FILE_DELIVERY=mode)
+    response = client.get('/static/uploads/projects/my logo.png', headers={'Range': 'bytes=0-9'})
+
+    # The proxy answers the Range itself, from the whole file
+    assert response.status_code == 200 and response.data == b''
+    expected = value or os.path.join(static, 'uploads', 'projects', 'my logo.png')
+    assert response.headers[header] == expected
+    assert [name for name in ('X-Accel-Redirect', 'X-Sendfile') if name in response.headers] == [header]
+
+
+@pytest.mark.parametrize('path', ['../secret.txt', 'uploads/missing.png', 'uploads'])
+def test_missing_and_escaping_paths_are_not_found(make_app, static, tmp_path, path):
+    write(static, 'uploads/projects/logo.png')
+    (tmp_path / 'secret.txt').write_text('no')
+    assert serve(make_app, static).get('/static/' + path).status_code == 404
+
+
+def test_unknown_delivery_mode_is_rejected(make_app):
+    with pytest.raises(ValueError):
+        make_app(FILE_DELIVERY='carrier-pigeon')
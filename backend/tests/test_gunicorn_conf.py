@@ -0,0 +1,69 @@
+import os
+import runpy
+from types import SimpleNamespace
+
+import pytest
+from gunicorn.config import Config
+
+from app import create_app
+from config import ProductionConfig
+from models import db
+
+CONF = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'gunicorn.conf.py')
+
+
+def load_conf(monkeypatch, **env):
+    for name in ('SERVER_MODE', 'WEB_CONCURRENCY', 'THREADS', 'BIND', 'PORT'):
+        monkeypatch.delenv(name, raising=False)
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    return runpy.run_path(CONF)
+
+
+def test_settings_are_valid_gunicorn_settings(monkeypatch):
+    conf = load_conf(monkeypatch)
+    config = Config()
+    for name, value in conf.items():
+        if name in config.settings:
+            config.set(name, value)
+
+    assert config.preload_app
+    assert config.worker_class_str == 'gthread'
+    assert config.bind == ['0.0.0.0:8000']
+
+
+@pytest.mark.parametrize('mode, app_name, worker_class', [
+    ('wsgi', 'wsgi:app', 'gthread'),
+    ('asgi', 'asgi:app', 'uvicorn.workers.UvicornWorker'),
+])
+def test_server_mode_picks_app_and_workers(monkeypatch, mode, app_name, worker_class):
+    conf = load_conf(monkeypatch, SERVER_MODE=mode, WEB_CONCURRENCY='3', PORT='5000')
+    assert (conf['wsgi_app'], conf['worker_class'], conf['workers']) == (app_name, worker_class, 3)
+    assert conf['bind'] == '0.0.0.0:5000'
+
+
+@pytest.mark.parametrize('cores, workers, threads', [(1, 3, 2), (2, 5, 4), (8, 17, 8)])
+def test_workers_and_threads_follow_the_core_count(monkeypatch, cores, workers, threads):
+    monkeypatch.setattr('multiprocessing.cpu_count', lambda: cores)
+    conf = load_conf(monkeypatch)
+    assert (conf['workers'], conf['threads']) == (workers, threads)
+
+
+def test_production_refuses_to_start_without_a_secret_key(monkeypatch):
+    monkeypatch.setattr(ProductionConfig, 'SECRET_KEY', None)
+    with pytest.raises(RuntimeError, match='SECRET_KEY'):
+        create_app('production', test_config={'SQLALCHEMY_DATABASE_URI': 'sqlite://'})
+
+
+def test_post_fork_gives_the_worker_its_own_connections(monkeypatch, app):
+    conf = load_conf(monkeypatch)
+    with app.app_context():
+        pool = db.engine.pool
+
+    # Under SERVER_MODE=asgi the loaded app is the ASGI wrapper around the Flask app
+    for loaded in (app, SimpleNamespace(flask_app=app)):
+        server = SimpleNamespace(app=SimpleNamespace(wsgi=lambda: loaded))
+        conf['post_fork'](server, None)
+        with app.app_context():
+            assert db.engine.pool is not pool
+            pool = db.engine.pool
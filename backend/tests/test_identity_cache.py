@@ -0,0 +1,73 @@
+from identity_cache import IdentityCache, AdminIdentity, SessionRevocations, parse_session_id
+from conftest import add_admin, login
+
+
+def test_parse_session_id():
+    assert parse_session_id('3:2') == (3, 2)
+    assert parse_session_id('3') == (3, 0)
+
+
+def test_cache_expires_entries():
+    cache = IdentityCache(ttl=-1)
+    cache.put(AdminIdentity(1, 'admin', 0))
+    assert cache.get(1) is None
+
+
+def test_cache_evicts_least_recently_used():
+    cache = IdentityCache(maxsize=2)
+    for admin_id in (1, 2):
+        cache.put(AdminIdentity(admin_id, 'admin', 0))
+    cache.get(1)
+    cache.put(AdminIdentity(3, 'admin', 0))
+    assert cache.get(2) is None
+    assert cache.get(1) is not None
+
+
+def copy_session(source, target):
+    target.set_cookie('session', source.get_cookie('session').value)
+
+
+def test_login_on_another_worker_reloads_stale_identity(make_app):
+    # Two workers on one database, each with its own identity cache
+    worker_a, worker_b = make_app(), make_app()
+    add_admin(worker_a)
+    client_a, client_b = worker_a.test_client(), worker_b.test_client()
+
+    login(client_a)
+    copy_session(client_a, client_b)
+    assert client_b.get('/admin/dashboard').status_code == 200
+    old_session = client_a.get_cookie('session').value
+
+    client_a.get('/admin/logout')
+    login(client_a)
+    copy_session(client_a, client_b)
+    assert client_b.get('/admin/dashboard').status_code == 200
+
+    # The session from before the logout stays revoked
+    client_b.set_cookie('session', old_session)
+    assert client_b.get('/admin/dashboard').status_code == 302
+
+
+def test_logout_revokes_copies_of_the_session(make_app):
+    # Logged out on one worker while a copy of the cookie is cached by another
+    worker_a, worker_b = make_app(), make_app()
+    add_admin(worker_a)
+    client_a, stolen = worker_a.test_client(), worker_b.test_client()
+    login(client_a)
+    copy_session(client_a, stolen)
+    assert stolen.get('/admin/dashboard').status_code == 200
+
+    client_a.get('/admin/logout')
+    assert stolen.get('/admin/dashboard').status_code == 302
+
+
+def test_revocation_markers_drop_cached_entries(tmp_path):
+    revocations = SessionRevocations(str(tmp_path))
+    cache = IdentityCache(revocations=revocations)
+    assert revocations.marker(1) is None
+    cache.put(AdminIdentity(1, 'admin', 0), revocations.marker(1))
+    assert cache.get(1, revocations.marker(1)) is not None
+
+    # Revoked by another worker's cache
+    IdentityCache(revocations=SessionRevocations(str(tmp_path))).revoke(1)
+    assert cache.get(1, cache.revocation_marker(1)) is None
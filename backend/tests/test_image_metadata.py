@@ -0,0 +1,83 @@
+import io
+import os
+
+import pytest
+from PIL import Image
+
+from models import db, Projects
+from uploads import image_metadata, set_image
+
+
+@pytest.fixture
+def static(app, tmp_path):
+    app.static_folder = str(tmp_path / 'static')
+    os.makedirs(os.path.join(app.static_folder, 'uploads', 'projects'))
+    return app.static_folder
+
+
+def write(static, name, data):
+    with open(os.path.join(static, 'uploads', 'projects', name), 'wb') as f:
+        f.write(data)
+    return f'uploads/projects/{name}'
+
+
+def png(size, color):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def test_raster_images_get_size_color_and_placeholder(app, static):
+    path = write(static, 'red.png', png((320, 200), (255, 0, 0)))
+    with app.app_context():
+        metadata = image_metadata(path)
+
+    assert (metadata['width'], metadata['height']) == (320, 200)
+    red, green, blue = (int(metadata['color'][i:i + 2], 16) for i in (1, 3, 5))
+    assert red > 240 and green < 16 and blue < 16
+    assert metadata['placeholder'].startswith('data:image/')
+    assert len(metadata['placeholder']) < 1000
+
+
+@pytest.mark.parametrize('svg, size', [
+    (b'<svg xmlns="http://www.w3.org/2000/svg" width="64px" height="32"></svg>', (64, 32)),
+    (b'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 120 80"></svg>', (120, 80)),
+    (b'<svg xmlns="http://www.w3.org/2000/svg"></svg>', None),
+])
+def test_svg_images_only_get_a_size(app, static, svg, size):
+    path = write(static, 'logo.svg', svg)
+    with app.app_context():
+        metadata = image_metadata(path)
+    assert metadata == ({'width': size[0], 'height': size[1]} if size else {})
+
+
+def test_unreadable_images_get_nothing(app, static):
+    path = write(static, 'broken.png', b'\x89PNG\r\n\x1a\nnot really')
+    with app.app_context():
+        assert image_metadata(path) == {}
+
+
+def test_set_image_fills_and_clears_the_metadata_columns(app, static):
+    path = write(static, 'blue.png', png((40, 30), (0, 0, 255)))
+    with app.app_context():
+        project = Projects(title='Engine', description='Analytical')
+        set_image(project, 'image_url', path)
+        db.session.add(project)
+        db.session.commit()
+        assert (project.image_url, project.image_width, project.image_height) == (path, 40, 30)
+        assert project.image_placeholder
+
+        set_image(project, 'image_url', None)
+        assert (project.image_width, project.image_color, project.image_placeholder) == (None, None, None)
+
+
+def test_project_cards_reserve_space_for_images(app, client, static):
+    path = write(static, 'blue.png', png((40, 30), (0, 0, 255)))
+    with app.app_context():
+        project = Projects(title='Engine', description='Analytical', featured=True)
+        set_image(project, 'image_url', path)
+        db.session.add(project)
+        db.session.commit()
+
+    body = client.get('/').get_data(as_text=True)
+    assert 'width="40"' in body and 'height="30"' in body
@@ -0,0 +1,68 @@
+import asyncio
+from contextlib import contextmanager
+
+import httpx
+import pytest
+from sqlalchemy import event
+
+from asgi import PortfolioASGI
+from models import db, Projects
+
+
+def add_projects(app, *descriptions):
+    with app.app_context():
+        for i, description in enumerate(descriptions):
+            db.session.add(Projects(title=f'Project {i}', description=description, featured=True))
+        db.session.commit()
+
+
+@contextmanager
+def count_queries(app):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+
+@pytest.mark.parametrize('path', ['/', '/admin/projects'])
+def test_list_pages_do_not_load_rows_one_by_one(app, admin_client, path):
+    add_projects(app, 'Short', '')
+    admin_client.get(path)  # loads the signed-in admin into the identity cache
+    with count_queries(app) as few:
+        assert admin_client.get(path).status_code == 200
+
+    add_projects(app, 'More', '', 'x' * 5000)
+    with count_queries(app) as many:
+        assert admin_client.get(path).status_code == 200
+    assert len(many) == len(few)
+
+
+def test_project_cards_show_an_excerpt_of_the_description(app, client):
+    add_projects(app, 'A' * 390 + 'B' * 10 + 'TAIL')
+    with count_queries(app) as statements:
+        body = client.get('/').get_data(as_text=True)
+
+    assert 'A' * 390 + 'B' * 10 in body
+    assert 'TAIL' not in body
+    assert not any('projects.description AS' in statement for statement in statements)
+
+
+def test_async_index_renders_projects_with_empty_descriptions(app):
+    add_projects(app, '', 'Has text')
+
+    async def get_index():
+        transport = httpx.ASGITransport(app=PortfolioASGI(app))
+        async with httpx.AsyncClient(transport=transport, base_url='http://localhost') as client:
+            return await client.get('/')
+
+    response = asyncio.run(get_index())
+    assert response.status_code == 200
+    assert 'Has text' in response.text
@@ -0,0 +1,108 @@
+import threading
+import time
+
+import pytest
+
+from conftest import add_tenant
+from notifications import ContactNotifier
+
+MESSAGE = {'name': 'Ada', 'email': 'ada@example.com', 'subject': 'Hi', 'message': 'Loved the engine project'}
+
+
+class FakeConnection:
+    """Records sent emails; the first ``failures`` sends raise"""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.sent = []
+        self.closed = 0
+        self.delivered = threading.Event()
+        self._smtp = None
+
+    def send(self, message):
+        if self.failures:
+            self.failures -= 1
+            raise OSError('connection refused')
+        self.sent.append(message)
+        self.delivered.set()
+
+    def close(self):
+        self.closed += 1
+
+
+@pytest.fixture
+def mail_app(make_app):
+    app = make_app(MAIL_SERVER='smtp.example.com', MAIL_NOTIFY_TO='me@example.com, you@example.com',
+                   MAIL_FLUSH_INTERVAL=0.05)
+    app.extensions['contact_notifier'].connection = FakeConnection()
+    yield app
+    app.extensions['contact_notifier'].stop()
+
+
+def message(id, tenant_id=None, **fields):
+    return {**MESSAGE, 'id': id, 'tenant_id': tenant_id, 'created_at': '2024-01-01 12:00', **fields}
+
+
+def test_notifications_are_off_without_mail_settings(app):
+    assert 'contact_notifier' not in app.extensions
+
+
+def test_committed_messages_are_sent_as_a_digest(mail_app):
+    client = mail_app.test_client()
+    notifier = mail_app.extensions['contact_notifier']
+    assert client.post('/contact', data=MESSAGE).json['success']
+    assert client.post('/contact', data={**MESSAGE, 'message': 'And a second note'}).json['success']
+    notifier.stop()
+
+    email, = notifier.connection.sent
+    assert email['Subject'] == '2 new contact messages'
+    assert email['To'] == 'me@example.com, you@example.com'
+    body = email.get_content()
+    assert 'Loved the engine project' in body and 'And a second note' in body
+
+
+def test_one_digest_per_tenant(mail_app):
+    tenant_id = add_tenant(mail_app, 'ada.example.com')
+    notifier = mail_app.extensions['contact_notifier']
+    notifier.flush([message(1), message(2, tenant_id), message(3, tenant_id, message='x' * 600)])
+
+    subjects = sorted(email['Subject'] for email in notifier.connection.sent)
+    assert subjects == ['1 new contact message', '2 new contact messages on ada.example.com']
+    assert 'x' * 500 + '...' in notifier.connection.sent[-1].get_content()
+
+
+def test_failed_digests_are_retried_without_resending(mail_app):
+    notifier = mail_app.extensions['contact_notifier']
+    notifier.connection = FakeConnection(failures=1)
+    notifier.notify(message(1))
+    assert notifier.connection.delivered.wait(2)
+    notifier.stop()
+    assert len(notifier.connection.sent) == 1
+
+
+def test_digests_are_dropped_after_max_retries(make_app):
+    app = make_app(MAIL_SERVER='smtp.example.com', MAIL_NOTIFY_TO='me@example.com')
+    notifier = ContactNotifier(app, FakeConnection(failures=10), 'me@example.com', ['me@example.com'],
+                               flush_interval=0.01, max_retries=2)
+    notifier.notify(message(1))
+    notifier.notify(message(2))
+    deadline = time.monotonic() + 2
+    while notifier.connection.failures > 7 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.1)
+    notifier.stop()
+
+    # One attempt and two retries, then the batch is given up
+    assert notifier.connection.failures == 7
+    assert notifier.connection.sent == []
+
+
+def test_messages_go_to_the_committing_apps_notifier(mail_app, make_app):
+    other = make_app(MAIL_SERVER='smtp.example.com', MAIL_NOTIFY_TO='other@example.com', MAIL_FLUSH_INTERVAL=0.05)
+    other.extensions['contact_notifier'].connection = FakeConnection()
+    other.test_client().post('/contact', data=MESSAGE)
+    other.extensions['contact_notifier'].stop()
+    mail_app.extensions['contact_notifier'].stop()
+
+    assert len(other.extensions['contact_notifier'].connection.sent) == 1
+    assert mail_app.extensions['contact_notifier'].connection.sent == []
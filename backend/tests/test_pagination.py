@@ -0,0 +1,88 @@
+import base64
+import json
+from datetime import date
+
+import pytest
+
+import pagination
+from admin_routes import SKILL_SORTS
+from models import db, Skills, Certifications
+from pagination import paginate, encode_cursor, decode_cursor
+
+ORDERS = [3, None, 1, 3, None, 2, 1, None, 0]
+
+
+@pytest.fixture
+def skills(app):
+    with app.app_context():
+        for i, order in enumerate(ORDERS):
+            skill = Skills(skill_name=f'Skill {i}', proficiency_level=i * 10)
+            db.session.add(skill)
+            db.session.flush()
+            # Set after the insert, which would fill in the column default
+            skill.display_order = order
+        db.session.commit()
+        return {skill.id: skill.display_order for skill in Skills.query}
+
+
+@pytest.fixture
+def small_pages(monkeypatch):
+    monkeypatch.setattr(pagination, 'PER_PAGE_OPTIONS', (2,))
+    monkeypatch.setattr(pagination, 'DEFAULT_PER_PAGE', 2)
+
+
+def skill_page(app, **args):
+    with app.test_request_context('/admin/skills', query_string=args):
+        return paginate(Skills.query, Skills, SKILL_SORTS, 'order', 'asc')
+
+
+def walk(app, direction, backwards=False, start=None):
+    """Ids of every row, following next (or previous) links from ``start``"""
+    seen = []
+    cursor = start
+    while True:
+        args = {'sort': 'order', 'dir': direction}
+        if cursor:
+            args['before' if backwards else 'after'] = cursor
+        result = skill_page(app, **args)
+        ids = [item.id for item in result]
+        seen = ids + seen if backwards else seen + ids
+        cursor = result.prev_cursor if backwards else result.next_cursor
+        if cursor is None:
+            return seen
+
+
+@pytest.mark.parametrize('direction', ['asc', 'desc'])
+def test_every_row_is_listed_once_with_nulls_last(app, skills, small_pages, direction):
+    ascending = sorted(skills, key=lambda id: (skills[id] is None, skills[id] or 0, id))
+    assert walk(app, direction) == (ascending if direction == 'asc' else ascending[::-1])
+
+
+def test_previous_links_walk_back_to_the_start(app, skills, small_pages):
+    forward = walk(app, 'asc')
+    last = skill_page(app, sort='order', dir='asc', after=encode_cursor(skills[forward[-2]], forward[-2]))
+    assert [item.id for item in last] == forward[-1:]
+    assert last.has_prev and not last.has_next
+    assert walk(app, 'asc', backwards=True, start=last.prev_cursor) + forward[-1:] == forward
+
+
+def test_cursors_round_trip():
+    assert decode_cursor(encode_cursor(date(2024, 5, 1), 7), Certifications.issue_date) == (date(2024, 5, 1), 7)
+    assert decode_cursor(encode_cursor(None, 3), Skills.display_order) == (None, 3)
+    assert decode_cursor(encode_cursor('Rust', 4), Skills.skill_name) == ('Rust', 4)
+
+
+def raw_cursor(value, item_id):
+    return base64.urlsafe_b64encode(json.dumps([value, item_id]).encode()).decode()
+
+
+@pytest.mark.parametrize('cursor', [
+    'not a cursor!',
+    raw_cursor('1; drop table skills', 1),
+    raw_cursor({'$gt': 1}, 1),
+    raw_cursor(50, '1'),
+    raw_cursor(None, 1),  # proficiency_level is NOT NULL
+])
+def test_tampered_cursors_are_bad_requests(admin_client, cursor):
+    response = admin_client.get('/admin/skills', query_string={'sort': 'proficiency', 'after': cursor})
+    assert response.status_code == 400
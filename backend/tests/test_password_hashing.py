@@ -0,0 +1,63 @@
+import threading
+
+import pytest
+
+from password_hashing import PasswordHasher, HasherBusy
+from helpers import in_child
+
+METHOD = 'pbkdf2:sha256:1000'
+
+
+def test_hash_and_verify():
+    hasher = PasswordHasher(method=METHOD)
+    pwhash = hasher.hash('secret')
+    assert hasher.verify(pwhash, 'secret')
+    assert not hasher.verify(pwhash, 'wrong')
+    assert not hasher.verify(None, 'secret')
+
+
+def test_needs_rehash_compares_the_method():
+    hasher = PasswordHasher(method=METHOD)
+    assert not hasher.needs_rehash(hasher.hash('secret'))
+    assert PasswordHasher(method='pbkdf2:sha256:2000').needs_rehash(hasher.hash('secret'))
+
+
+def test_rejects_work_beyond_pool_and_queue():
+    hasher = PasswordHasher(method=METHOD, max_workers=1, max_queue=1, timeout=5)
+    release = threading.Event()
+    results = []
+
+    def call():
+        results.append(hasher._run(release.wait))
+
+    # One call running and one queued take every slot
+    threads = [threading.Thread(target=call) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for _ in range(200):
+        if hasher._slots._value == 0:
+            break
+        threading.Event().wait(0.01)
+    with pytest.raises(HasherBusy):
+        hasher._run(lambda: True)
+
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert results == [True, True]
+    # Slots are handed back once the work is done
+    assert hasher.verify(hasher.hash('secret'), 'secret')
+
+
+def test_slow_hash_times_out_as_busy():
+    hasher = PasswordHasher(method=METHOD, max_workers=1, max_queue=0, timeout=0.01)
+    release = threading.Event()
+    with pytest.raises(HasherBusy):
+        hasher._run(release.wait)
+    release.set()
+
+
+def test_pool_is_rebuilt_after_fork():
+    hasher = PasswordHasher(method=METHOD)
+    pwhash = hasher.hash('secret')
+    assert in_child(lambda: hasher.verify(pwhash, 'secret')) == 0
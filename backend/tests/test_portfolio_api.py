@@ -0,0 +1,66 @@
+from app import PORTFOLIO_SECTIONS
+from content_cache import ContentCache
+from models import db, Bio, Skills
+
+
+def add_skill(app, name, order=0):
+    with app.app_context():
+        db.session.add(Skills(skill_name=name, proficiency_level=80, display_order=order))
+        db.session.commit()
+
+
+def test_portfolio_returns_every_section(app, client):
+    with app.app_context():
+        db.session.add(Bio(name='Ada', about_me='Engines', email='ada@example.com'))
+        db.session.commit()
+    add_skill(app, 'Python')
+
+    data = client.get('/api/portfolio').json
+
+    assert list(data) == list(PORTFOLIO_SECTIONS)
+    assert data['bio']['name'] == 'Ada'
+    assert [skill['skill_name'] for skill in data['skills']] == ['Python']
+    assert data['projects'] == []
+
+
+def test_portfolio_fields_select_sections(client):
+    assert list(client.get('/api/portfolio?fields=skills,bio,skills').json) == ['skills', 'bio']
+    response = client.get('/api/portfolio?fields=bio,secrets')
+    assert response.status_code == 400
+    assert 'secrets' in response.json['error']
+
+
+def test_portfolio_is_revalidated_and_rebuilt_after_changes(app, client):
+    add_skill(app, 'Python')
+    first = client.get('/api/portfolio?fields=skills')
+    etag = first.headers['ETag']
+    assert 'no-cache' in first.headers['Cache-Control']
+    assert client.get('/api/portfolio?fields=skills', headers={'If-None-Match': etag}).status_code == 304
+
+    add_skill(app, 'Rust', order=1)
+    second = client.get('/api/portfolio?fields=skills', headers={'If-None-Match': etag})
+    assert second.status_code == 200
+    assert [skill['skill_name'] for skill in second.json['skills']] == ['Python', 'Rust']
+
+
+def test_content_cache_skips_values_built_from_stale_data():
+    cache = ContentCache()
+    version = cache.version(1)
+    cache.bump(1)
+    cache.set('key', b'stale', tenant=1, version=version)
+    assert cache.get('key', tenant=1) is None
+
+    cache.set('key', b'fresh', tenant=1)
+    cache.set('key', b'other', tenant=2)
+    cache.bump(2)
+    assert cache.get('key', tenant=1) == b'fresh'
+    assert cache.get('key', tenant=2) is None
+
+
+def test_content_cache_evicts_from_the_largest_tenant():
+    cache = ContentCache(maxsize=3, tenant_maxsize=3)
+    for key in ('a', 'b', 'c'):
+        cache.set(key, key, tenant=1)
+    cache.set('x', 'x', tenant=2)
+    assert cache.get('a', tenant=1) is None
+    assert cache.get('x', tenant=2) == 'x'
@@ -0,0 +1,101 @@
+import asyncio
+import threading
+import time
+
+import httpx
+
+from asgi import PortfolioASGI
+from conftest import add_admin, login
+from helpers import client_for
+from profiling import ProfilerSettings, Sampler
+
+
+def profiled(app):
+    """Check the switch on every request and add a route slow enough to get samples"""
+    app.extensions['profiler']['settings'].refresh = 0
+
+    @app.route('/slow')
+    def slow():
+        time.sleep(0.05)
+        return 'done'
+
+    return app
+
+
+def enable(client, route=''):
+    return client.post('/admin/profiler', data={'enabled': 'on', 'sample_rate': '100', 'route': route})
+
+
+def profiles(app):
+    return app.extensions['profiler']['store'].summaries()
+
+
+def test_settings_file_is_shared_and_tolerates_garbage(tmp_path):
+    path = str(tmp_path / 'profiler.json')
+    writer, reader = ProfilerSettings(path, refresh=0), ProfilerSettings(path, refresh=0)
+    assert reader.current()['enabled'] is False
+
+    writer.save(enabled=True, sample_rate=0.5)
+    assert reader.current() == {'enabled': True, 'sample_rate': 0.5, 'route': ''}
+    with open(path, 'w') as f:
+        f.write('{"enabled": fal')
+    assert reader.current()['enabled'] is True
+
+
+def test_sampled_requests_are_saved_as_folded_stacks(app):
+    profiled(app)
+    client = app.test_client()
+    add_admin(app)
+    login(client)
+
+    assert enable(client, route='slow').status_code == 302
+    client.get('/api/portfolio')
+    assert client.get('/slow').data == b'done'
+
+    summary, = profiles(app)
+    assert (summary['endpoint'], summary['status']) == ('slow', 200)
+    folded = client.get(f'/admin/profiler/{summary["id"]}.folded').get_data(as_text=True)
+    assert 'slow (' in folded
+    assert folded.splitlines()[0].rsplit(' ', 1)[1].isdigit()
+
+
+def test_profiler_switch_is_kept_per_tenant(tenant_app):
+    app = profiled(tenant_app)
+    tenants = app.tenant_ids
+    ada = client_for(app, 'ada.example.com')
+    grace = client_for(app, 'grace.example.com')
+    add_admin(app, 'ada', tenant_id=tenants['ada.example.com'])
+    login(ada, 'ada')
+
+    enable(ada)
+    grace.get('/slow')
+    assert profiles(app) == []
+
+    ada.get('/slow')
+    assert [summary['tenant_id'] for summary in profiles(app)] == [tenants['ada.example.com']]
+
+
+def test_overlapping_profiles_on_one_thread_keep_their_own_stacks():
+    sampler = Sampler(interval=0.001)
+    first = sampler.track(threading.get_ident())
+    second = sampler.track(threading.get_ident())
+    time.sleep(0.05)
+    first_stacks = sampler.untrack(first)
+    assert sampler.untrack(second) is not first_stacks
+    assert first_stacks and sampler.untrack(first) is None
+    sampler.stop()
+
+
+def test_async_views_are_timed_without_stacks(app):
+    app.extensions['profiler']['settings'].for_tenant(None).save(enabled=True, sample_rate=1.0)
+    app.extensions['profiler']['settings'].refresh = 0
+    asgi_app = PortfolioASGI(app)
+
+    async def overlapping():
+        transport = httpx.ASGITransport(app=asgi_app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://localhost') as client:
+            return await asyncio.gather(client.get('/'), client.get('/'))
+
+    assert [response.status_code for response in asyncio.run(overlapping())] == [200, 200]
+    summaries = profiles(app)
+    assert [(s['endpoint'], s['timing_only'], s['samples']) for s in summaries] == [('index', True, 0)] * 2
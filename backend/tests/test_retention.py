@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta
+
+from events import broker
+from models import db, ContactSubmission, ContactArchive
+from retention import archive_read_messages, search_archive
+
+
+def add_messages(app, *messages):
+    with app.app_context():
+        for days_old, read, name in messages:
+            db.session.add(ContactSubmission(name=name, email=f'{name.lower()}@example.com', message='Hello',
+                                             read=read, created_at=datetime.utcnow() - timedelta(days=days_old)))
+        db.session.commit()
+
+
+def test_only_old_read_messages_are_archived(app):
+    add_messages(app, (100, True, 'Old'), (100, False, 'Unread'), (10, True, 'Recent'))
+    subscription = broker.subscribe()
+    try:
+        with app.app_context():
+            assert archive_read_messages(90) == 1
+            assert sorted(m.name for m in ContactSubmission.query) == ['Recent', 'Unread']
+            archived = ContactArchive.query.one()
+            assert (archived.name, archived.email) == ('Old', 'old@example.com')
+    finally:
+        broker.unsubscribe(subscription)
+    assert subscription.get_nowait() == ('counts', {'total_messages': -1})
+
+
+def test_archiving_works_in_bounded_batches(app):
+    add_messages(app, *[(100, True, f'Sender{i}') for i in range(5)])
+    with app.app_context():
+        assert archive_read_messages(90, batch_size=2, max_batches=2) == 4
+        assert ContactSubmission.query.count() == 1
+        assert archive_read_messages(90, batch_size=2) == 1
+        assert ContactArchive.query.count() == 5
+
+
+def test_search_archive_matches_any_field(app):
+    add_messages(app, (100, True, 'Ada'), (100, True, 'Grace'))
+    with app.app_context():
+        archive_read_messages(90)
+        assert [m.name for m in search_archive('grace@')] == ['Grace']
+        assert len(search_archive()) == 2
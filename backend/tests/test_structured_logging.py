@@ -0,0 +1,98 @@
+import json
+import logging
+import os
+
+import pytest
+
+from helpers import in_child
+from structured_logging import BatchingWatchedFileHandler, JsonFormatter
+
+
+def read_log(app):
+    app.extensions['log_listener'].stop()
+    with open(app.config['LOG_FILE']) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_access_records_carry_request_fields(app, client):
+    client.get('/api/portfolio', headers={'X-Request-ID': 'abc123'})
+    access, = [entry for entry in read_log(app) if entry['logger'] == 'portfolio.access']
+
+    assert access['message'] == 'GET /api/portfolio 200'
+    assert (access['request_id'], access['route'], access['status']) == ('abc123', 'api_portfolio', 200)
+    assert access['db_queries'] > 0 and access['latency_ms'] >= access['db_ms']
+
+
+def test_tracebacks_are_rendered_into_the_record(app):
+    try:
+        raise ValueError('bad value')
+    except ValueError:
+        app.logger.exception('Something failed')
+    entry, = read_log(app)
+
+    assert entry['level'] == 'ERROR'
+    assert 'ValueError: bad value' in entry['exc']
+
+
+def test_records_are_dropped_and_counted_when_the_queue_is_full(make_app):
+    app = make_app(LOG_QUEUE_SIZE=2)
+    listener = app.extensions['log_listener']
+    listener.ensure_started = lambda: None  # nothing drains the queue
+    for i in range(5):
+        app.logger.warning('record %d', i)
+    assert listener.dropped == 3
+
+    del listener.ensure_started
+    listener.ensure_started()
+    messages = [entry['message'] for entry in read_log(app)]
+    assert messages == ['record 0', 'record 1', 'Log queue full, dropped 3 records']
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs fork()')
+def test_forked_workers_write_their_records(app):
+    # As under gunicorn's preload: the master logs, then workers are forked from it
+    app.logger.warning('from the parent')
+
+    def worker():
+        app.logger.warning('from the child')
+        app.extensions['log_listener'].stop()
+        return True
+
+    assert in_child(worker) == 0
+    messages = {entry['message'] for entry in read_log(app)}
+    assert messages == {'from the parent', 'from the child'}
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs fork()')
+def test_workers_writing_at_once_keep_lines_whole(app):
+    # Batches well over a buffer's size, so a split write would show up as a broken line
+    pids = []
+    for worker in range(4):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                for i in range(50):
+                    app.logger.warning('worker %d record %d %s', worker, i, 'x' * 4000)
+                app.extensions['log_listener'].stop()
+            finally:
+                os._exit(0)
+        pids.append(pid)
+    for pid in pids:
+        os.waitpid(pid, 0)
+
+    messages = [entry['message'].rsplit(' ', 1)[0] for entry in read_log(app)]
+    assert sorted(messages) == sorted(f'worker {w} record {i}' for w in range(4) for i in range(50))
+
+
+def test_log_file_is_reopened_after_rotation(tmp_path):
+    path = str(tmp_path / 'portfolio.log')
+    handler = BatchingWatchedFileHandler(path, delay=True)
+    handler.setFormatter(JsonFormatter())
+    handler.emit_batch([logging.makeLogRecord({'msg': 'before'})])
+    os.rename(path, path + '.1')  # what logrotate does
+
+    handler.emit_batch([logging.makeLogRecord({'msg': 'after'})])
+    handler.close()
+    for name, expected in ((path + '.1', 'before'), (path, 'after')):
+        with open(name) as f:
+            assert [json.loads(line)['message'] for line in f] == [expected]
@@ -0,0 +1,57 @@
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from models import Admin, Skills
+from conftest import add_admin, login
+from helpers import client_for
+
+
+def test_usernames_are_unique_without_a_tenant(app):
+    add_admin(app, 'admin')
+    with pytest.raises(IntegrityError):
+        add_admin(app, 'admin')
+
+
+def test_usernames_are_unique_per_tenant(tenant_app):
+    ada, grace = tenant_app.tenant_ids.values()
+    add_admin(tenant_app, 'admin', tenant_id=ada)
+    add_admin(tenant_app, 'admin', tenant_id=grace)
+    with pytest.raises(IntegrityError):
+        add_admin(tenant_app, 'admin', tenant_id=ada)
+    with tenant_app.app_context():
+        assert Admin.query.count() == 2
+
+
+def test_unknown_hosts_are_not_served(tenant_app):
+    assert client_for(tenant_app, 'nobody.example.com').get('/api/portfolio').status_code == 404
+
+
+def test_content_is_kept_per_tenant(tenant_app):
+    ada = client_for(tenant_app, 'ada.example.com')
+    grace = client_for(tenant_app, 'grace.example.com')
+    add_admin(tenant_app, 'ada', tenant_id=tenant_app.tenant_ids['ada.example.com'])
+    login(ada, 'ada')
+
+    assert ada.post('/admin/skills/add', data={'skill_name': 'Engines', 'proficiency_level': '90'}).status_code == 302
+    with tenant_app.app_context():
+        skill = Skills.query.one()
+        assert skill.tenant_id == tenant_app.tenant_ids['ada.example.com']
+
+    assert [s['skill_name'] for s in ada.get('/api/portfolio?fields=skills').json['skills']] == ['Engines']
+    assert grace.get('/api/portfolio?fields=skills').json['skills'] == []
+
+
+def test_admins_only_sign_in_to_their_own_portfolio(tenant_app):
+    add_admin(tenant_app, 'ada', tenant_id=tenant_app.tenant_ids['ada.example.com'])
+    grace = client_for(tenant_app, 'grace.example.com')
+
+    login(grace, 'ada')
+    assert grace.get('/admin/dashboard').status_code == 302
+
+    ada = client_for(tenant_app, 'ada.example.com')
+    login(ada, 'ada')
+    assert ada.get('/admin/dashboard').status_code == 200
+    # The session cookie doesn't carry over to another portfolio
+    grace.set_cookie('session', ada.get_cookie('session', domain='ada.example.com').value,
+                     domain='grace.example.com')
+    assert grace.get('/admin/dashboard').status_code == 302
@@ -0,0 +1,89 @@
+import hashlib
+import io
+import os
+
+import pytest
+
+from uploads import ChunkStore, UploadError, sniff_image
+
+PNG = b'\x89PNG\r\n\x1a\n' + bytes(range(256)) * 40
+
+
+class BrokenStream(io.BytesIO):
+    """A request body whose connection drops after ``limit`` bytes"""
+
+    def __init__(self, data, limit):
+        super().__init__(data)
+        self.limit = limit
+
+    def read(self, size=-1):
+        if self.tell() >= self.limit:
+            raise ConnectionResetError('client went away')
+        return super().read(min(size, self.limit - self.tell()))
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ChunkStore(str(tmp_path / 'partial'))
+
+
+def test_sniff_image_checks_content_against_extension():
+    assert sniff_image(PNG[:512], 'png')
+    assert not sniff_image(PNG[:512], 'jpg')
+    assert sniff_image(b'<?xml version="1.0"?><svg xmlns="http://www.w3.org/2000/svg"/>', 'svg')
+
+
+def test_interrupted_chunk_leaves_the_hash_intact(store, tmp_path):
+    upload_id, state = store.create('logo.png', len(PNG), 'uploads/projects/')
+    state, _ = store.append(upload_id, state, io.BytesIO(PNG[:4000]), 4000)
+
+    rest = PNG[4000:]
+    with pytest.raises(ConnectionResetError):
+        store.append(upload_id, store.load_state(upload_id), BrokenStream(rest, 3000), len(rest))
+    state = store.load_state(upload_id)
+    assert state['offset'] == 4000
+
+    state, _ = store.append(upload_id, state, io.BytesIO(rest), len(rest))
+    filename, digest = store.finish(upload_id, state, str(tmp_path))
+
+    assert digest == hashlib.sha256(PNG).hexdigest()
+    assert filename == f'logo_{digest[:12]}.png'
+    with open(tmp_path / filename, 'rb') as f:
+        assert f.read() == PNG
+
+
+def test_resumed_upload_rebuilds_the_hash_from_disk(tmp_path):
+    root = str(tmp_path / 'partial')
+    upload_id, state = ChunkStore(root).create('logo.png', len(PNG), 'uploads/projects/')
+    ChunkStore(root).append(upload_id, state, io.BytesIO(PNG[:4000]), 4000)
+
+    # Another worker, with nothing cached, finishes the upload
+    other = ChunkStore(root)
+    state, _ = other.append(upload_id, other.load_state(upload_id), io.BytesIO(PNG[4000:]), len(PNG) - 4000)
+    _, digest = other.finish(upload_id, state, str(tmp_path))
+    assert digest == hashlib.sha256(PNG).hexdigest()
+
+
+def test_first_chunk_must_look_like_the_image_type(store):
+    upload_id, state = store.create('logo.png', 100, 'uploads/projects/')
+    with pytest.raises(UploadError) as error:
+        store.append(upload_id, state, io.BytesIO(b'GIF89a' + bytes(94)), 100)
+    assert error.value.status == 415
+
+
+def test_chunked_upload_endpoints(app, admin_client, tmp_path):
+    app.static_folder = str(tmp_path / 'static')
+    response = admin_client.post('/admin/uploads', json={'filename': 'logo.png', 'size': len(PNG), 'kind': 'projects'})
+    assert response.status_code == 201
+    upload_id = response.json['upload_id']
+    url = f'/admin/uploads/{upload_id}'
+
+    assert admin_client.patch(url, data=PNG[:5000], headers={'Upload-Offset': '0'}).json['offset'] == 5000
+    mismatch = admin_client.patch(url, data=PNG[5000:], headers={'Upload-Offset': '0'})
+    assert (mismatch.status_code, mismatch.json['offset']) == (409, 5000)
+    assert admin_client.patch(url, data=PNG[5000:], headers={'Upload-Offset': '5000'}).json['offset'] == len(PNG)
+
+    response = admin_client.post(f'{url}/complete')
+    assert response.json['sha256'] == hashlib.sha256(PNG).hexdigest()
+    assert os.path.isfile(os.path.join(app.static_folder, response.json['path']))
+    assert admin_client.get(url).status_code == 404
@@ -0,0 +1,390 @@
+import base64
+import hashlib
+import io
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from flask import Blueprint, request, jsonify, current_app
+from flask_login import login_required
+from werkzeug.utils import secure_filename
+from PIL import Image, UnidentifiedImageError, features
+from tenancy import current_tenant_id
+
+uploads = Blueprint('uploads', __name__)
+
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'svg', 'webp'}
+UPLOAD_KINDS = {'projects', 'profile', 'certifications'}
+READ_SIZE = 64 * 1024
+SNIFF_SIZE = 512
+PLACEHOLDER_SIZE = 16  # px on the long side; blurred by the browser when scaled up
+SVG_SIZE_RE = re.compile(rb'<svg[^>]*?\swidth="([\d.]+)(?:px)?"[^>]*?\sheight="([\d.]+)(?:px)?"', re.S)
+SVG_VIEWBOX_RE = re.compile(rb'<svg[^>]*?\sviewBox="[\d.+-]+[\s,]+[\d.+-]+[\s,]+([\d.]+)[\s,]+([\d.]+)"', re.S)
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def allowed_file(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+
+def sniff_image(head, extension):
+    """Check the first bytes of a file against the type its extension claims"""
+    extension = extension.lower()
+    if extension == 'png':
+        return head.startswith(b'\x89PNG\r\n\x1a\n')
+    if extension in ('jpg', 'jpeg'):
+        return head.startswith(b'\xff\xd8\xff')
+    if extension == 'gif':
+        return head[:6] in (b'GIF87a', b'GIF89a')
+    if extension == 'webp':
+        return head[:4] == b'RIFF' and head[8:12] == b'WEBP'
+    if extension == 'svg':
+        text = head.lstrip(b'\xef\xbb\xbf \t\r\n').lower()
+        return text.startswith((b'<?xml', b'<svg', b'<!--', b'<!doctype svg')) and b'<svg' in head.lower()
+    return False
+
+
+def _extension(filename):
+    return filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
+
+
+def upload_prefix(kind, tenant_id=None):
+    """Static path prefix for uploads of ``kind``; each tenant gets its own tree"""
+    if tenant_id is None:
+        return f'uploads/{kind}/'
+    return f'uploads/t{tenant_id}/{kind}/'
+
+
+def _upload_dir(prefix):
+    path = os.path.join(current_app.static_folder, prefix)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _unique_filename(filename, digest=None):
+    name, ext = os.path.splitext(secure_filename(filename))
+    suffix = digest[:12] if digest else datetime.utcnow().strftime('%Y%m%d_%H%M%S')
+    return f'{name}_{suffix}{ext}'
+
+
+def save_image_upload(field, kind):
+    """Store the image sent for ``field`` and return its static path, or None.
+
+    Accepts either a path produced by the chunked upload endpoints (sent
+    as ``<field>_upload``) or a regular multipart file, whose header is
+    checked before anything is written to disk.
+    """
+    prefix = upload_prefix(kind, current_tenant_id())
+    uploaded = request.form.get(f'{field}_upload', '').strip()
+    if uploaded:
+        full_path = os.path.join(current_app.static_folder, uploaded)
+        if not uploaded.startswith(prefix) or '..' in uploaded or not os.path.isfile(full_path):
+            raise UploadError('Invalid uploaded file reference')
+        return uploaded
+
+    file = request.files.get(field)
+    if not file or not file.filename:
+        return None
+    if not allowed_file(file.filename):
+        raise UploadError('File type not allowed')
+
+    head = file.stream.read(SNIFF_SIZE)
+    if not sniff_image(head, _extension(file.filename)):
+        raise UploadError('File content does not match its image type')
+    file.stream.seek(0)
+
+    filename = _unique_filename(file.filename)
+    file.save(os.path.join(_upload_dir(prefix), filename))
+    return prefix + filename
+
+
+def _svg_size(path):
+    with open(path, 'rb') as f:
+        head = f.read(4096)
+    match = SVG_SIZE_RE.search(head) or SVG_VIEWBOX_RE.search(head)
+    if not match:
+        return {}
+    return {'width': round(float(match.group(1))), 'height': round(float(match.group(2)))}
+
+
+def image_metadata(static_path):
+    """Intrinsic size, dominant color and a tiny data: URI placeholder for a stored image.
+
+    Missing values are left out: SVGs only get a size, and files Pillow
+    can't read get nothing.
+    """
+    path = os.path.join(current_app.static_folder, static_path)
+    if _extension(static_path) == 'svg':
+        return _svg_size(path)
+    try:
+        with Image.open(path) as image:
+            width, height = image.size
+            # Lets JPEG decode at a fraction of full size; the placeholder is tiny anyway
+            image.draft('RGB', (PLACEHOLDER_SIZE * 4, PLACEHOLDER_SIZE * 4))
+            thumb = image.convert('RGB')
+            thumb.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+    except (OSError, UnidentifiedImageError):
+        return {}
+
+    palette = thumb.quantize(colors=4)
+    count, index = max(palette.getcolors())
+    red, green, blue = palette.getpalette()[index * 3:index * 3 + 3]
+
+    encoded = io.BytesIO()
+    image_format = 'WEBP' if features.check('webp') else 'JPEG'
+    thumb.save(encoded, image_format, quality=40)
+    placeholder = f'data:image/{image_format.lower()};base64,' + base64.b64encode(encoded.getvalue()).decode('ascii')
+    return {'width': width, 'height': height, 'color': f'#{red:02x}{green:02x}{blue:02x}',
+            'placeholder': placeholder}
+
+
+def set_image(obj, column, static_path):
+    """Point ``obj.<column>`` at an uploaded image and record its metadata.
+
+    The metadata columns share the image column's name without ``_url``,
+    e.g. ``image_url`` -> ``image_width``, ``profile_image`` -> ``profile_image_width``.
+    """
+    setattr(obj, column, static_path)
+    metadata = image_metadata(static_path) if static_path else {}
+    for key in ('width', 'height', 'color', 'placeholder'):
+        setattr(obj, _metadata_column(column, key), metadata.get(key))
+
+
+def _metadata_column(column, key):
+    prefix = column[:-4] if column.endswith('_url') else column
+    return f'{prefix}_{key}'
+
+
+class ChunkStore:
+    """Partial uploads on disk: ``<id>.part`` holds the bytes, ``<id>.json`` the state.
+
+    Running sha256 objects are kept in a small in-process cache; when a
+    resumed upload lands on another worker the hash is rebuilt from the
+    part file once.
+    """
+
+    def __init__(self, root, max_hashers=64):
+        self.root = root
+        self.max_hashers = max_hashers
+        self._hashers = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, upload_id, suffix):
+        if not upload_id.isalnum():
+            raise UploadError('Unknown upload', 404)
+        return os.path.join(self.root, upload_id + suffix)
+
+    def create(self, filename, size, prefix, tenant_id=None):
+        upload_id = uuid.uuid4().hex
+        state = {'filename': filename, 'size': size, 'prefix': prefix, 'tenant_id': tenant_id,
+                 'offset': 0, 'created_at': time.time()}
+        open(self._path(upload_id, '.part'), 'wb').close()
+        self.save_state(upload_id, state)
+        return upload_id, state
+
+    def load_state(self, upload_id):
+        try:
+            with open(self._path(upload_id, '.json')) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise UploadError('Unknown upload', 404)
+
+    def save_state(self, upload_id, state):
+        tmp_path = self._path(upload_id, '.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self._path(upload_id, '.json'))
+
+    def hasher(self, upload_id, offset):
+        """A sha256 of the first ``offset`` bytes of the part file.
+
+        A cached hasher is taken out of the cache: it is updated in place,
+        so it only goes back (through ``remember``) once its bytes are saved.
+        """
+        with self._lock:
+            entry = self._hashers.pop(upload_id, None)
+            if entry and entry[1] == offset:
+                return entry[0]
+
+        hasher = hashlib.sha256()
+        with open(self._path(upload_id, '.part'), 'rb') as f:
+            remaining = offset
+            while remaining:
+                data = f.read(min(READ_SIZE, remaining))
+                if not data:
+                    break
+                hasher.update(data)
+                remaining -= len(data)
+        return hasher
+
+    def remember(self, upload_id, hasher, offset):
+        with self._lock:
+            self._hashers[upload_id] = (hasher, offset)
+            self._hashers.move_to_end(upload_id)
+            while len(self._hashers) > self.max_hashers:
+                self._hashers.popitem(last=False)
+
+    def append(self, upload_id, state, stream, length):
+        """Stream ``length`` bytes from ``stream`` onto the part file"""
+        offset = state['offset']
+        if offset + length > state['size']:
+            raise UploadError('Chunk goes past the declared file size')
+
+        hasher = self.hasher(upload_id, offset)
+        with open(self._path(upload_id, '.part'), 'r+b') as f:
+            f.seek(offset)
+            f.truncate()
+            remaining = length
+            while remaining:
+                data = stream.read(min(READ_SIZE, remaining))
+                if not data:
+                    break
+                if offset == 0 and not sniff_image(data[:SNIFF_SIZE], _extension(state['filename'])):
+                    raise UploadError('File content does not match its image type', 415)
+                f.write(data)
+                hasher.update(data)
+                offset += len(data)
+                remaining -= len(data)
+
+        state['offset'] = offset
+        self.save_state(upload_id, state)
+        self.remember(upload_id, hasher, offset)
+        return state, hasher
+
+    def discard(self, upload_id):
+        with self._lock:
+            self._hashers.pop(upload_id, None)
+        for suffix in ('.part', '.json'):
+            try:
+                os.remove(self._path(upload_id, suffix))
+            except FileNotFoundError:
+                pass
+
+    def finish(self, upload_id, state, destination_dir):
+        digest = self.hasher(upload_id, state['offset']).hexdigest()
+        filename = _unique_filename(state['filename'], digest)
+        shutil.move(self._path(upload_id, '.part'), os.path.join(destination_dir, filename))
+        self.discard(upload_id)
+        return filename, digest
+
+    def purge_stale(self, max_age):
+        cutoff = time.time() - max_age
+        for entry in os.scandir(self.root):
+            if entry.name.endswith('.json') and entry.stat().st_mtime < cutoff:
+                self.discard(entry.name[:-5])
+
+
+def _store():
+    return current_app.extensions['chunk_store']
+
+
+def _load_state(store, upload_id):
+    state = store.load_state(upload_id)
+    # Uploads started on one portfolio can't be read or finished from another
+    if state.get('tenant_id') != current_tenant_id():
+        raise UploadError('Unknown upload', 404)
+    return state
+
+
+@uploads.errorhandler(UploadError)
+def upload_error(e):
+    return jsonify({'success': False, 'message': str(e)}), e.status
+
+
+@uploads.route('/admin/uploads', methods=['POST'])
+@login_required
+def start_upload():
+    data = request.get_json(silent=True) or {}
+    filename = secure_filename(data.get('filename', ''))
+    kind = data.get('kind')
+    try:
+        size = int(data.get('size', 0))
+    except (TypeError, ValueError):
+        size = 0
+
+    if kind not in UPLOAD_KINDS:
+        raise UploadError('Unknown upload kind')
+    if not filename or not allowed_file(filename):
+        raise UploadError('File type not allowed')
+    if size <= 0 or size > current_app.config['UPLOAD_MAX_SIZE']:
+        raise UploadError('File is empty or too large', 413)
+
+    store = _store()
+    store.purge_stale(current_app.config['UPLOAD_PARTIAL_TTL'])
+    tenant_id = current_tenant_id()
+    upload_id, state = store.create(filename, size, upload_prefix(kind, tenant_id), tenant_id)
+    return jsonify({'success': True, 'upload_id': upload_id, 'offset': 0,
+                    'chunk_size': current_app.config['UPLOAD_CHUNK_SIZE']}), 201
+
+
+@uploads.route('/admin/uploads/<upload_id>', methods=['GET'])
+@login_required
+def upload_status(upload_id):
+    state = _load_state(_store(), upload_id)
+    return jsonify({'success': True, 'offset': state['offset'], 'size': state['size']})
+
+
+@uploads.route('/admin/uploads/<upload_id>', methods=['PATCH'])
+@login_required
+def upload_chunk(upload_id):
+    store = _store()
+    state = _load_state(store, upload_id)
+
+    offset = request.headers.get('Upload-Offset', type=int)
+    if offset != state['offset']:
+        # Client and server disagree, e.g. after a dropped request: tell it where to resume
+        return jsonify({'success': False, 'message': 'Offset mismatch', 'offset': state['offset']}), 409
+
+    length = request.content_length
+    if not length or length > current_app.config['UPLOAD_CHUNK_SIZE']:
+        raise UploadError('Missing or oversized chunk', 413)
+
+    try:
+        state, _ = store.append(upload_id, state, request.stream, length)
+    except UploadError as e:
+        if e.status == 415:
+            store.discard(upload_id)
+        raise
+    return jsonify({'success': True, 'offset': state['offset'], 'size': state['size']})
+
+
+@uploads.route('/admin/uploads/<upload_id>/complete', methods=['POST'])
+@login_required
+def complete_upload(upload_id):
+    store = _store()
+    state = _load_state(store, upload_id)
+    if state['offset'] != state['size']:
+        return jsonify({'success': False, 'message': 'Upload incomplete', 'offset': state['offset']}), 409
+
+    filename, digest = store.finish(upload_id, state, _upload_dir(state['prefix']))
+    return jsonify({'success': True, 'path': state['prefix'] + filename, 'sha256': digest})
+
+
+def init_uploads(app):
+    root = app.config.get('UPLOAD_PARTIAL_DIR') or os.path.join(app.instance_path, 'partial-uploads')
+    app.extensions['chunk_store'] = ChunkStore(root)
+    app.register_blueprint(uploads)
+
+    @app.cli.command('image-metadata')
+    def image_metadata_command():
+        """Record size and placeholder for images uploaded before they were tracked."""
+        from models import db, Projects, Bio, Certifications
+        updated = 0
+        for model, column in ((Projects, 'image_url'), (Bio, 'profile_image'), (Certifications, 'image_url')):
+            for obj in model.query.filter(getattr(model, column).isnot(None),
+                                          getattr(model, _metadata_column(column, 'width')).is_(None)):
+                set_image(obj, column, getattr(obj, column))
+                updated += 1
+        db.session.commit()
+        print(f'Updated {updated} images')
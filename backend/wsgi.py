@@ -0,0 +1,4 @@
+# WSGI entry point; the config comes from FLASK_CONFIG (see gunicorn.conf.py)
+from app import create_app
+
+app = create_app()
@@ -15,6 +15,8 @@ class AdminPanel {
         this.setupAutoSave();
         this.setupKeyboardShortcuts();
         this.setupExportFunctionality();
+        this.setupLiveNotifications();
+        this.setupMessageExpansion();
     }
 
     setupFileUploads() {
@@ -31,22 +33,126 @@ class AdminPanel {
     }
 
     validateAndPreviewFile(file, input) {
-        const maxSize = 5 * 1024 * 1024; // 5MB
-        const allowedTypes = ['image/jpeg', 'image/png', 'image/gif', 'image/webp'];
+        // Chunked uploads stream to disk on the server, so they can be much larger
+        const chunked = Boolean(input.dataset.uploadKind);
+        const maxSize = (chunked ? 50 : 5) * 1024 * 1024;
+        const allowedTypes = ['image/jpeg', 'image/png', 'image/gif', 'image/webp', 'image/svg+xml'];
         
         if (file.size > maxSize) {
-            this.showNotification('File size must be less than 5MB', 'error');
+            this.showNotification(`File size must be less than ${chunked ? 50 : 5}MB`, 'error');
             input.value = '';
             return;
         }
         
         if (!allowedTypes.includes(file.type)) {
-            this.showNotification('Please upload a valid image file (JPEG, PNG, GIF, WebP)', 'error');
+            this.showNotification('Please upload a valid image file (JPEG, PNG, GIF, WebP, SVG)', 'error');
             input.value = '';
             return;
         }
 
         this.previewImage(file, input);
+
+        if (chunked) {
+            this.uploadInChunks(file, input);
+        }
+    }
+
+    async uploadInChunks(file, input) {
+        const form = input.form;
+        const submitButtons = form ? form.querySelectorAll('button[type="submit"]') : [];
+        const resumeKey = `upload:${input.dataset.uploadKind}:${file.name}:${file.size}:${file.lastModified}`;
+        const status = this.uploadStatusElement(input);
+
+        submitButtons.forEach(button => button.disabled = true);
+        try {
+            let uploadId = localStorage.getItem(resumeKey);
+            let offset = 0;
+            let chunkSize = 1024 * 1024;
+
+            // Resume an interrupted upload of the same file where the server left off
+            if (uploadId) {
+                const response = await fetch(`/admin/uploads/${uploadId}`);
+                if (response.ok) {
+                    offset = (await response.json()).offset;
+                } else {
+                    uploadId = null;
+                }
+            }
+
+            if (!uploadId) {
+                const response = await fetch('/admin/uploads', {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify({ filename: file.name, size: file.size, kind: input.dataset.uploadKind })
+                });
+                const result = await response.json();
+                if (!response.ok) throw new Error(result.message);
+                uploadId = result.upload_id;
+                chunkSize = result.chunk_size;
+                localStorage.setItem(resumeKey, uploadId);
+            }
+
+            let failures = 0;
+            while (offset < file.size) {
+                status.textContent = `Uploading... ${Math.floor(offset / file.size * 100)}%`;
+                let response;
+                try {
+                    response = await fetch(`/admin/uploads/${uploadId}`, {
+                        method: 'PATCH',
+                        headers: { 'Upload-Offset': offset, 'Content-Type': 'application/offset+octet-stream' },
+                        body: file.slice(offset, offset + chunkSize)
+                    });
+                } catch (networkError) {
+                    if (++failures > 5) throw networkError;
+                    await new Promise(resolve => setTimeout(resolve, 500 * 2 ** failures));
+                    continue;
+                }
+
+                const result = await response.json();
+                if (response.status === 409) {
+                    offset = result.offset;
+                    continue;
+                }
+                if (!response.ok) {
+                    if (response.status !== 413) localStorage.removeItem(resumeKey);
+                    throw new Error(result.message);
+                }
+                offset = result.offset;
+                failures = 0;
+            }
+
+            const response = await fetch(`/admin/uploads/${uploadId}/complete`, { method: 'POST' });
+            const result = await response.json();
+            if (!response.ok) throw new Error(result.message);
+            localStorage.removeItem(resumeKey);
+
+            // The form now only references the stored file instead of re-sending it
+            let hidden = form.querySelector(`input[name="${input.name}_upload"]`);
+            if (!hidden) {
+                hidden = document.createElement('input');
+                hidden.type = 'hidden';
+                hidden.name = `${input.name}_upload`;
+                form.appendChild(hidden);
+            }
+            hidden.value = result.path;
+            input.value = '';
+            status.textContent = 'Upload complete';
+        } catch (error) {
+            status.textContent = '';
+            this.showNotification(`Upload failed: ${error.message}`, 'error');
+        } finally {
+            submitButtons.forEach(button => button.disabled = false);
+        }
+    }
+
+    uploadStatusElement(input) {
+        let status = input.parentNode.querySelector('.upload-status');
+        if (!status) {
+            status = document.createElement('div');
+            status.className = 'upload-status text-sm text-white/60 mt-1';
+            input.insertAdjacentElement('afterend', status);
+        }
+        return status;
     }
 
     previewImage(file, input) {
@@ -477,6 +583,64 @@ class AdminPanel {
         };
     }
 
+    setupLiveNotifications() {
+        const eventsUrl = document.body.dataset.eventsUrl;
+        if (!eventsUrl || !window.EventSource || !document.querySelector('[data-stat]')) return;
+
+        const source = new EventSource(eventsUrl);
+
+        // Full snapshot, sent whenever the stream (re)connects
+        source.addEventListener('stats', (e) => {
+            const stats = JSON.parse(e.data);
+            Object.entries(stats).forEach(([key, value]) => this.setStat(key, value));
+        });
+
+        // Deltas from content writes and new contact submissions
+        source.addEventListener('counts', (e) => {
+            const counts = JSON.parse(e.data);
+            Object.entries(counts).forEach(([key, delta]) => {
+                const element = document.querySelector(`[data-stat="${key}"]`);
+                const current = element ? parseInt(element.textContent, 10) || 0 : 0;
+                this.setStat(key, Math.max(0, current + delta));
+            });
+        });
+
+        source.addEventListener('new_message', (e) => {
+            const message = JSON.parse(e.data);
+            const sender = document.createElement('span');
+            sender.textContent = message.name || message.email || 'a visitor';
+            this.showNotification(`New message from ${sender.innerHTML}`, 'info');
+        });
+
+        window.addEventListener('beforeunload', () => source.close());
+    }
+
+    setupMessageExpansion() {
+        // The inbox only renders message excerpts; fetch the full text on demand
+        document.querySelectorAll('[data-full-message-url]').forEach(button => {
+            button.addEventListener('click', () => {
+                button.disabled = true;
+                fetch(button.dataset.fullMessageUrl, { headers: { 'X-Requested-With': 'XMLHttpRequest' } })
+                    .then(response => response.json())
+                    .then(data => {
+                        const body = button.parentNode.querySelector('[data-message-body]');
+                        body.textContent = data.message;
+                        button.remove();
+                    })
+                    .catch(() => {
+                        button.disabled = false;
+                        this.showNotification('Error loading message', 'error');
+                    });
+            });
+        });
+    }
+
+    setStat(key, value) {
+        document.querySelectorAll(`[data-stat="${key}"]`).forEach(element => {
+            element.textContent = value;
+        });
+    }
+
     showNotification(message, type = 'info') {
         const notification = document.createElement('div');
         notification.className = `fixed top-4 right-4 z-50 px-6 py-3 rounded-lg ${
@@ -15,6 +15,7 @@ class PortfolioApp {
         this.setupTooltips();
         this.setupCopyToClipboard();
         this.setupServiceWorker();
+        this.setupClickTracking();
     }
 
     setupSkillBars() {
@@ -324,6 +325,22 @@ class PortfolioApp {
         }
     }
 
+    setupClickTracking() {
+        // Beacons are queued by the browser, so following the link is never delayed
+        if (!navigator.sendBeacon) return;
+        const track = (e) => {
+            const link = e.target.closest('[data-track-project]');
+            if (!link) return;
+            const payload = JSON.stringify({
+                project_id: parseInt(link.dataset.trackProject, 10),
+                target: link.dataset.trackTarget
+            });
+            navigator.sendBeacon('/api/track', new Blob([payload], { type: 'application/json' }));
+        };
+        document.addEventListener('click', track);
+        document.addEventListener('auxclick', track);  // middle-click opens a tab too
+    }
+
     showNotification(message, type = 'info') {
         // Remove existing notifications
         const existingNotifications = document.querySelectorAll('.notification');